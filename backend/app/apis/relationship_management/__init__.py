@@ -10,6 +10,7 @@ from app.apis.models import (
     RelationshipStrength, NetworkStrength, RelationshipResponse,
     TokenRequest
 )
+from app.apis.relationship_strength import calculate_response_time_score
 
 router = APIRouter(prefix="/relationship", tags=["relationships"])
 
@@ -238,13 +239,15 @@ async def get_relationship_strength_v1(user1_id: str, user2_id: str) -> Relation
         
         # Calculate overall strength score
         strength_score = calculate_strength_score(relationship.metrics)
+        # Normalized 0.0-1.0 responsiveness, not the raw response time in hours
+        response_rate = calculate_response_time_score(relationship.metrics.avg_response_time) / 100
         
         return RelationshipStrength(
             overall_score=strength_score,
             metrics=relationship.metrics.dict(),
             interaction_frequency=relationship.metrics.interaction_frequency,
             quality_score=relationship.metrics.quality_score,
-            response_rate=relationship.metrics.avg_response_time or 0.0,
+            response_rate=response_rate,
             successful_introductions=relationship.metrics.successful_introductions,
             last_interaction=relationship.last_interaction.isoformat() if relationship.last_interaction else None
         ).dict()
@@ -275,6 +278,7 @@ async def get_network_strength(user_id: str) -> NetworkStrength:
             other_id = rel.user2_id if rel.user1_id == user_id else rel.user1_id
             network_scores[other_id] = {
                 "score": calculate_strength_score(rel.metrics),
+                "response_rate": calculate_response_time_score(rel.metrics.avg_response_time) / 100,
                 "type": rel.type,
                 "status": rel.status,
                 "last_interaction": rel.last_interaction.isoformat() if rel.last_interaction else None
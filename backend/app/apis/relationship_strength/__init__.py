@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict
 from pydantic import BaseModel
@@ -190,26 +191,33 @@ def calculate_relationship_strength(user1_id: str, user2_id: str) -> StrengthSco
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/strength/network/{user_id}")
-def calculate_network_strength(user_id: str) -> Dict[str, float]:
+async def calculate_network_strength(user_id: str) -> Dict[str, float]:
     """Get relationship strength scores for user's entire network
     
+    Per-connection scores are fetched concurrently, so wall time is bound by
+    the slowest single lookup rather than the sum of all of them.
+    
     Returns:
         Dict mapping user_ids to strength scores
     """
     try:
-        # Get user's network
-        network = db.storage.json.get('user_network', default={})
+        # Get user's network without blocking the event loop on the read
+        network = await asyncio.to_thread(db.storage.json.get, 'user_network', default={})
         connections = network.get(user_id, [])
         
-        # Calculate strength for each connection
+        # Calculate strength for each connection concurrently
+        tasks = [
+            asyncio.to_thread(calculate_relationship_strength, user_id, connection_id)
+            for connection_id in connections
+        ]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
         strengths = {}
-        for connection_id in connections:
-            try:
-                strength = calculate_relationship_strength(user_id, connection_id)
-                strengths[connection_id] = strength.overall_score
-            except Exception as e:
-                print(f"[WARNING] Failed to get strength for {connection_id}: {str(e)}")
+        for connection_id, result in zip(connections, results):
+            if isinstance(result, Exception):
+                print(f"[WARNING] Failed to get strength for {connection_id}: {str(result)}")
                 continue
+            strengths[connection_id] = result.overall_score
                 
         return strengths
         
@@ -3,10 +3,11 @@
 This module provides route-related API endpoints and permissions endpoints.
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import Response
+from typing import Dict, Optional, Any
 import databutton as db
+import orjson
 from enum import Enum
 
 from app.apis.models import UserRole
@@ -29,31 +30,135 @@ def route_admin_analytics_dashboard_endpoint():
     # Call the synchronous implementation we created in admin_analytics
     return get_admin_analytics_dashboard()
 
-class Permission(BaseModel):
-    """Model representing a granular permission"""
-    resource: str = Field(..., description="Resource the permission applies to")
-    actions: List[str] = Field(..., description="Actions allowed on the resource")
-    description: Optional[str] = Field(None, description="Description of the permission")
-    
-    model_config = {"arbitrary_types_allowed": True}
-
-class Role(BaseModel):
-    """Model representing a user role with permissions"""
-    id: str = Field(..., description="Role identifier")
-    name: str = Field(..., description="Human-readable role name")
-    permissions: List[Permission] = Field(..., description="Permissions granted to this role")
-    
-    model_config = {"arbitrary_types_allowed": True}
+# Static permission structure for all roles. None of it depends on the
+# request, so it is built once as plain JSON-native data at import time
+# instead of as Pydantic models. Shape:
+#   routes:   role -> list of route patterns the role may access
+#   features: feature flag -> enabled
+#   roles:    role -> {id, name, permissions: [{resource, actions, description}]}
+_PERMISSIONS_PAYLOAD: Dict[str, Any] = {
+    # Backward-compatible route access by role
+    "routes": {
+        "admin": ["/admin/*", "/moderation/*", "/analytics/*", "/settings/*"],
+        "moderator": ["/moderation/*", "/analytics/view"],
+        "analyst": ["/analytics/*", "/moderation/view"],
+        "user": ["/profile/*", "/matching/*"]
+    },
+    # Backward-compatible feature flags
+    "features": {
+        "can_approve_reports": True,
+        "can_edit_rules": True,
+        "can_view_analytics": True,
+        "can_manage_users": True,
+        "can_batch_moderate": True,
+        "can_export_data": True,
+        "can_test_patterns": True,
+        "can_view_effectiveness": True,
+        "can_view_audit_logs": True
+    },
+    # Detailed role permissions
+    "roles": {
+        "admin": {
+            "id": "admin",
+            "name": "Administrator",
+            "permissions": [
+                {
+                    "resource": "moderation",
+                    "actions": ["view", "update", "create", "delete", "batch"],
+                    "description": "Full access to moderation system"
+                },
+                {
+                    "resource": "users",
+                    "actions": ["view", "update", "create", "delete"],
+                    "description": "Full access to user management"
+                },
+                {
+                    "resource": "analytics",
+                    "actions": ["view", "export"],
+                    "description": "Full access to analytics dashboard"
+                },
+                {
+                    "resource": "settings",
+                    "actions": ["view", "update"],
+                    "description": "Access to system settings"
+                },
+                {
+                    "resource": "rules",
+                    "actions": ["view", "create", "update", "delete", "test"],
+                    "description": "Full access to content rules"
+                }
+            ]
+        },
+        "moderator": {
+            "id": "moderator",
+            "name": "Content Moderator",
+            "permissions": [
+                {
+                    "resource": "moderation",
+                    "actions": ["view", "update"],
+                    "description": "View and update moderation content"
+                },
+                {
+                    "resource": "users",
+                    "actions": ["view"],
+                    "description": "View user profiles"
+                },
+                {
+                    "resource": "analytics",
+                    "actions": ["view"],
+                    "description": "View-only access to analytics dashboard"
+                },
+                {
+                    "resource": "rules",
+                    "actions": ["view", "test"],
+                    "description": "View and test content rules"
+                }
+            ]
+        },
+        "analyst": {
+            "id": "analyst",
+            "name": "Analytics Analyst",
+            "permissions": [
+                {
+                    "resource": "analytics",
+                    "actions": ["view", "export"],
+                    "description": "Full access to analytics dashboard"
+                },
+                {
+                    "resource": "moderation",
+                    "actions": ["view"],
+                    "description": "View-only access to moderation content"
+                },
+                {
+                    "resource": "rules",
+                    "actions": ["view"],
+                    "description": "View-only access to content rules"
+                }
+            ]
+        },
+        "user": {
+            "id": "user",
+            "name": "Standard User",
+            "permissions": [
+                {
+                    "resource": "profile",
+                    "actions": ["view", "update"],
+                    "description": "Access to own profile"
+                },
+                {
+                    "resource": "matching",
+                    "actions": ["view", "create"],
+                    "description": "Access to matching system"
+                }
+            ]
+        }
+    }
+}
 
-class RolePermissionResponse(BaseModel):
-    """Response model for role permissions"""
-    routes: Dict[str, List[str]] = Field(..., description="Route access by role")
-    features: Dict[str, bool] = Field(..., description="Feature flags")
-    roles: Dict[str, Role] = Field(..., description="Detailed role permissions")
-    
-    model_config = {"arbitrary_types_allowed": True}
+# Serialized once so the handler only hands out the cached bytes
+_STATIC_PERMISSIONS_JSON: bytes = orjson.dumps(_PERMISSIONS_PAYLOAD)
 
-@router.post("/permissions")
+@router.post("/permissions", response_class=Response)
 async def get_permissions(token: Optional[Dict] = None):
     """Get permission structure for roles
     
@@ -61,140 +166,8 @@ async def get_permissions(token: Optional[Dict] = None):
     to determine which features are available to each user role.
     
     Returns detailed permission structures for all roles, as well as
-    backward-compatible routes and features dictionaries.
+    backward-compatible routes and features dictionaries. The payload is
+    serialized once at import time, so no model construction or JSON encoding
+    happens per call.
     """
-    try:
-        # Define the permissions for each role
-        admin_permissions = [
-            Permission(
-                resource="moderation",
-                actions=["view", "update", "create", "delete", "batch"],
-                description="Full access to moderation system"
-            ),
-            Permission(
-                resource="users",
-                actions=["view", "update", "create", "delete"],
-                description="Full access to user management"
-            ),
-            Permission(
-                resource="analytics",
-                actions=["view", "export"],
-                description="Full access to analytics dashboard"
-            ),
-            Permission(
-                resource="settings",
-                actions=["view", "update"],
-                description="Access to system settings"
-            ),
-            Permission(
-                resource="rules",
-                actions=["view", "create", "update", "delete", "test"],
-                description="Full access to content rules"
-            )
-        ]
-        
-        moderator_permissions = [
-            Permission(
-                resource="moderation",
-                actions=["view", "update"],
-                description="View and update moderation content"
-            ),
-            Permission(
-                resource="users",
-                actions=["view"],
-                description="View user profiles"
-            ),
-            Permission(
-                resource="analytics",
-                actions=["view"],
-                description="View-only access to analytics dashboard"
-            ),
-            Permission(
-                resource="rules",
-                actions=["view", "test"],
-                description="View and test content rules"
-            )
-        ]
-        
-        analyst_permissions = [
-            Permission(
-                resource="analytics",
-                actions=["view", "export"],
-                description="Full access to analytics dashboard"
-            ),
-            Permission(
-                resource="moderation",
-                actions=["view"],
-                description="View-only access to moderation content"
-            ),
-            Permission(
-                resource="rules",
-                actions=["view"],
-                description="View-only access to content rules"
-            )
-        ]
-        
-        user_permissions = [
-            Permission(
-                resource="profile",
-                actions=["view", "update"],
-                description="Access to own profile"
-            ),
-            Permission(
-                resource="matching",
-                actions=["view", "create"],
-                description="Access to matching system"
-            )
-        ]
-        
-        # Define roles with their permissions
-        roles = {
-            "admin": Role(
-                id="admin",
-                name="Administrator",
-                permissions=admin_permissions
-            ),
-            "moderator": Role(
-                id="moderator",
-                name="Content Moderator",
-                permissions=moderator_permissions
-            ),
-            "analyst": Role(
-                id="analyst",
-                name="Analytics Analyst",
-                permissions=analyst_permissions
-            ),
-            "user": Role(
-                id="user",
-                name="Standard User",
-                permissions=user_permissions
-            )
-        }
-        
-        # Create backward-compatible response structure
-        return RolePermissionResponse(
-            routes={
-                "admin": ["/admin/*", "/moderation/*", "/analytics/*", "/settings/*"],
-                "moderator": ["/moderation/*", "/analytics/view"],
-                "analyst": ["/analytics/*", "/moderation/view"],
-                "user": ["/profile/*", "/matching/*"]
-            },
-            features={
-                "can_approve_reports": True,
-                "can_edit_rules": True,
-                "can_view_analytics": True,
-                "can_manage_users": True,
-                "can_batch_moderate": True,
-                "can_export_data": True,
-                "can_test_patterns": True,
-                "can_view_effectiveness": True,
-                "can_view_audit_logs": True
-            },
-            roles=roles
-        )
-    except Exception as e:
-        print(f"Error getting permissions: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail="Error retrieving permissions data"
-        ) from e
+    return Response(content=_STATIC_PERMISSIONS_JSON, media_type="application/json")
@@ -1,248 +1,446 @@
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from pydantic import BaseModel
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse, Response
+import asyncio
+import threading
 import traceback
+import heapq
+from hashlib import blake2b
+import numpy as np
 import databutton as db
+import orjson
+from cachetools import LRUCache, TTLCache
+from app.apis.utils import sanitize_key
 from app.apis.models import ExtendedUserProfile, SearchResult, SearchPreset, SearchHistoryEntry, PaginatedSearchResponse, SearchFilters
 
 router = APIRouter(tags=["search"])
 
 # Cache for user profiles and match percentages to reduce storage reads and calculations
-_profile_cache = {}
-_match_cache = {}
-_last_cache_update = None
 _cache_ttl = 300  # 5 minutes in seconds
+_profile_cache = TTLCache(maxsize=1, ttl=_cache_ttl)
+_score_cache_size = 128  # Distinct filter sets kept per profile snapshot
 
-def _get_cached_profiles():
-    """Get profiles from cache or storage with TTL"""
-    global _last_cache_update, _profile_cache
-    
-    current_time = datetime.now()
-    
-    # If cache is empty or expired, refresh it
-    if (_last_cache_update is None or 
-        (current_time - _last_cache_update).total_seconds() > _cache_ttl):
+# Strong references to fire-and-forget storage writes until they finish
+_background_tasks = set()
+
+# Filter fields that do not affect match scores
+_UNSCORED_FILTER_FIELDS = {"page", "page_size", "search_query"}
+
+def _get_cached_profiles() -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """Get profiles and their scoring SoA from cache or storage with TTL"""
+    try:
+        return _profile_cache["all"]
+    except KeyError:
         print("[DEBUG] Refreshing profile cache")
-        _profile_cache = db.storage.json.get("user_profiles", default={})
-        _last_cache_update = current_time
-    
-    return _profile_cache
+        profiles = db.storage.json.get("user_profiles", default={})
+        snapshot = (profiles, _build_soa(profiles))
+        _profile_cache["all"] = snapshot
+        return snapshot
 
-# Using models from central models.py
+def get_search_history_key(user_id: str) -> str:
+    """Generate storage key for a user's search history shard"""
+    return sanitize_key(f"search_history.{user_id}")
 
+def _load_search_history(user_id: str) -> List[Dict[str, Any]]:
+    """Get a user's search history shard, moving their entries out of the
+    legacy shared "search_history" blob on first access"""
+    history_key = get_search_history_key(user_id)
+    history = db.storage.json.get(history_key, default=None)
+    if history is None:
+        legacy_history = db.storage.json.get("search_history", default={})
+        history = [entry for entry in legacy_history.values() if entry.get("user_id") == user_id]
+        # Stored even when empty, so the legacy blob is only scanned once per user
+        db.storage.json.put(history_key, history)
+    return history
 
+# One lock per user, so overlapping background writes to the same history
+# shard run one at a time instead of dropping each other's entries
+_search_history_locks: Dict[str, threading.Lock] = {}
 
-def _are_roles_compatible(role1: str, role2: str) -> bool:
-    """Check if two roles can be matched"""
-    # Capital raisers can match with all investor types
-    if role1 == 'capital_raiser' or role2 == 'capital_raiser':
-        return True
+def _save_search_history(history_entry: SearchHistoryEntry) -> None:
+    """Append an entry to its user's search history shard"""
+    try:
+        history_key = get_search_history_key(history_entry.user_id)
+        with _search_history_locks.setdefault(history_entry.user_id, threading.Lock()):
+            history = _load_search_history(history_entry.user_id)
+            history.append(history_entry.model_dump(mode="json"))
+            db.storage.json.put(history_key, history)
         
+        print(f"[DEBUG] Saved search history for user {history_entry.user_id}")
+    except Exception as history_error:
+        print(f"[ERROR] Failed to save search history: {str(history_error)}")
+
+def get_search_preset_key(preset_id: str) -> str:
+    """Generate storage key for a single search preset"""
+    return sanitize_key(f"search_presets.{preset_id}")
+
+def get_user_presets_index_key(user_id: str) -> str:
+    """Generate storage key for a user's search preset index"""
+    return sanitize_key(f"user_presets_index.{user_id}")
+
+def _load_user_preset_ids(user_id: str) -> List[str]:
+    """Get a user's preset index, moving their presets out of the legacy
+    shared "search_presets" blob on first access"""
+    index_key = get_user_presets_index_key(user_id)
+    preset_ids = db.storage.json.get(index_key, default=None)
+    if preset_ids is None:
+        preset_ids = []
+        for preset_id, preset in db.storage.json.get("search_presets", default={}).items():
+            if preset.get("user_id") == user_id:
+                db.storage.json.put(get_search_preset_key(preset_id), preset)
+                preset_ids.append(preset_id)
+        # Stored even when empty; from then on a missing preset key means deleted
+        db.storage.json.put(index_key, preset_ids)
+    return preset_ids
+
+def _load_preset(preset_id: str) -> Optional[Dict[str, Any]]:
+    """Read one preset from its own key, falling back to the legacy shared blob
+    for owners whose presets have not been moved yet"""
+    preset = db.storage.json.get(get_search_preset_key(preset_id), default=None)
+    if preset is None:
+        legacy_preset = db.storage.json.get("search_presets", default={}).get(preset_id)
+        if legacy_preset and not db.storage.json.exists(get_user_presets_index_key(legacy_preset["user_id"])):
+            _load_user_preset_ids(legacy_preset["user_id"])
+            preset = legacy_preset
+    return preset
+
+# Using models from central models.py
+
+
+
+# Symmetric set of (role1, role2) pairs that can be matched, besides any
+# pair involving a capital raiser
+_COMPATIBLE_PAIRS = frozenset(
     # Fund of Funds can match with fund managers
-    if (role1 == 'fund_of_funds' and role2 == 'fund_manager') or \
-       (role1 == 'fund_manager' and role2 == 'fund_of_funds'):
-        return True
-        
+    {('fund_of_funds', 'fund_manager'), ('fund_manager', 'fund_of_funds')} |
     # Fund managers and LPs can match with each other
-    if (role1 in ['fund_manager', 'limited_partner'] and 
-        role2 in ['fund_manager', 'limited_partner']):
-        return True
-        
-    return False
-
-def _get_cache_key(profile_id: str, filters: SearchFilters) -> str:
-    """Generate a cache key for match percentage caching"""
-    # Convert filters to a stable string representation
-    filter_str = str(sorted(filters.dict(exclude_unset=True).items()))
-    return f"{profile_id}:{hash(filter_str)}"
-
-def calculate_match_percentage(user_profile: Dict[str, any], search_filters: SearchFilters) -> float:
-    """Calculate match percentage between a user profile and search filters with enhanced weighting"""
-    weights = {
-        'role_match': 30,
-        'fund_type': 20,
-        'fund_size': 15,
-        'investment_focus': 20,
-        'historical_returns': 10,
-        'risk_profile': 5,
-        'investment_horizon': 10,
-        'investment_size': 15,
-        'deal_size': 10,
-        'industry_focus': 25,
-        'experience': 15,
-        'sectors': 20,
-        'track_record': 10
+    {('fund_manager', 'fund_manager'), ('fund_manager', 'limited_partner'),
+     ('limited_partner', 'fund_manager'), ('limited_partner', 'limited_partner')}
+)
+
+def _are_roles_compatible(role1: str, role2: str) -> bool:
+    """Check if two roles can be matched"""
+    # Capital raisers can match with any role, including ones outside UserType
+    return 'capital_raiser' in (role1, role2) or (role1, role2) in _COMPATIBLE_PAIRS
+
+def _get_filter_key(filters: SearchFilters) -> str:
+    """Deterministic key for the scoring-relevant part of the filters"""
+    scored_filters = filters.model_dump(mode="json", exclude_unset=True, exclude=_UNSCORED_FILTER_FIELDS)
+    return blake2b(orjson.dumps(scored_filters, option=orjson.OPT_SORT_KEYS), digest_size=8).hexdigest()
+
+def _as_float(value: Any) -> float:
+    """Convert a stored numeric profile field to float, using NaN for missing values"""
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _lower_text(value: Any) -> str:
+    """Lower-case a stored text field for substring search"""
+    return value.lower() if isinstance(value, str) else ''
+
+def _encode_categories(values: List[Optional[str]]) -> Tuple[np.ndarray, Dict[str, int]]:
+    """Dictionary-encode categorical values; missing values get code -1"""
+    vocab: Dict[str, int] = {}
+    codes = np.fromiter(
+        (vocab.setdefault(value, len(vocab)) if value else -1 for value in values),
+        dtype=np.int32,
+        count=len(values)
+    )
+    return codes, vocab
+
+def _encode_sets(values: List[Optional[List[str]]]) -> Tuple[np.ndarray, Dict[str, int]]:
+    """Encode list-valued fields as a (profiles x vocabulary) membership matrix"""
+    vocab: Dict[str, int] = {}
+    rows, cols = [], []
+    for row, items in enumerate(values):
+        for item in set(items or ()):
+            rows.append(row)
+            cols.append(vocab.setdefault(item, len(vocab)))
+    matrix = np.zeros((len(values), len(vocab)), dtype=bool)
+    matrix[rows, cols] = True
+    return matrix, vocab
+
+def _build_soa(profiles: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Project profile dicts into a structure of arrays for vectorized scoring
+    
+    Profiles are validated into ExtendedUserProfile here, once per snapshot;
+    ones that fail are left out so every row can be returned by a search.
+    """
+    uids, rows, models = [], [], []
+    for uid, profile in profiles.items():
+        if uid == "demo_user_1" or not isinstance(profile, dict):  # Skip demo user
+            continue
+        try:
+            models.append(ExtendedUserProfile(**profile))
+        except Exception as validation_error:
+            print(f"[ERROR] Skipping invalid profile {uid}: {str(validation_error)}")
+            continue
+        uids.append(uid)
+        rows.append(profile)
+
+    roles, role_vocab = _encode_categories([p.get('role') for p in rows])
+    fund_types, fund_type_vocab = _encode_categories([p.get('fund_type') for p in rows])
+    risk_profiles, risk_profile_vocab = _encode_categories([p.get('risk_profile') for p in rows])
+    investment_focus, investment_focus_vocab = _encode_sets([p.get('investment_focus') for p in rows])
+    industry_focus, industry_focus_vocab = _encode_sets([p.get('industry_focus') for p in rows])
+    sectors, sectors_vocab = _encode_sets([p.get('sectors') for p in rows])
+
+    def numeric(values) -> np.ndarray:
+        return np.fromiter((_as_float(v) for v in values), dtype=np.float64, count=len(rows))
+
+    # Secondary index of row positions per role; None holds profiles without a role
+    rows_by_role = {role: np.flatnonzero(roles == code) for role, code in role_vocab.items()}
+    rows_by_role[None] = np.flatnonzero(roles == -1)
+
+    return {
+        "uids": uids,
+        "models": models,
+        "roles": roles,
+        "role_vocab": role_vocab,
+        "rows_by_role": rows_by_role,
+        "fund_types": fund_types,
+        "fund_type_vocab": fund_type_vocab,
+        "risk_profiles": risk_profiles,
+        "risk_profile_vocab": risk_profile_vocab,
+        "investment_focus": investment_focus,
+        "investment_focus_vocab": investment_focus_vocab,
+        "industry_focus": industry_focus,
+        "industry_focus_vocab": industry_focus_vocab,
+        "sectors": sectors,
+        "sectors_vocab": sectors_vocab,
+        "fund_sizes": numeric(p.get('fund_size') for p in rows),
+        "historical_returns": numeric(p.get('historical_returns') for p in rows),
+        "investment_horizons": numeric(p.get('investment_horizon') for p in rows),
+        "minimum_investments": numeric(p.get('minimum_investment') for p in rows),
+        "maximum_investments": numeric(
+            p.get('typical_investment_size') or p.get('fund_size') for p in rows
+        ),
+        # Falsy deal sizes never match
+        "deal_sizes": numeric(p.get('typical_deal_size') or None for p in rows),
+        "years_experience": numeric(p.get('years_experience') for p in rows),
+        "has_track_record": np.fromiter(
+            (bool(p.get('track_record')) for p in rows), dtype=bool, count=len(rows)
+        ),
+        # Lower-cased once here instead of per profile on every text search
+        "company_names": [_lower_text(p.get('company_name')) for p in rows],
+        "display_names": [_lower_text(p.get('display_name')) for p in rows],
+        # Match scores for this snapshot, keyed by _get_filter_key
+        "scores": LRUCache(maxsize=_score_cache_size),
     }
-    # Check role compatibility first
-    if search_filters.user_type and user_profile.get('role'):
-        if not _are_roles_compatible(search_filters.user_type, user_profile.get('role')):
-            return 0  # Incompatible roles, no need to calculate further
+
+def _in_range(values: np.ndarray, low: Optional[float], high: Optional[float]) -> np.ndarray:
+    """Mask of values within optional bounds; NaN (missing) never matches"""
+    mask = ~np.isnan(values)
+    if low is not None:
+        mask &= values >= low
+    if high is not None:
+        mask &= values <= high
+    return mask
+
+def _overlap_ratio(matrix: np.ndarray, vocab: Dict[str, int], query_set: frozenset) -> np.ndarray:
+    """Fraction of the query values present in each profile's set"""
+    cols = [vocab[value] for value in query_set if value in vocab]
+    if not cols:
+        return np.zeros(matrix.shape[0])
+    return matrix[:, cols].sum(axis=1) / len(query_set)
+
+def _query_sets(search_filters: SearchFilters) -> Dict[str, frozenset]:
+    """Value sets from the filters, built once per scoring pass
     
-    total_weight = 0
-    matched_weight = 0
+    The investment focus set is shared by the investment and industry
+    focus criteria.
+    """
+    return {
+        'investment_focus': frozenset(search_filters.investment_focus or ()),
+        'sectors': frozenset(search_filters.sectors or ()),
+    }
+
+def _candidate_rows(soa: Dict[str, Any], search_filters: SearchFilters) -> np.ndarray:
+    """Row positions whose role is compatible with the searched user type"""
+    if not search_filters.user_type:
+        return np.arange(len(soa["uids"]))
+    # Profiles without a role are always compatible
+    buckets = [
+        rows for role, rows in soa["rows_by_role"].items()
+        if role is None or _are_roles_compatible(search_filters.user_type, role)
+    ]
+    # Keep storage order so ties rank the same as a full scan
+    return np.sort(np.concatenate(buckets))
+
+def _score_profiles(soa: Dict[str, Any], search_filters: SearchFilters, rows: np.ndarray) -> np.ndarray:
+    """Vectorized match percentage of the given SoA rows against the search filters
     
+    Rows are expected to come from _candidate_rows, so role compatibility
+    has already been applied.
+    """
+    n = len(rows)
+    # Slicing gives views; fancy indexing would copy every column it touches
+    if n == len(soa["uids"]):
+        rows = slice(None)
+    total_weight = np.zeros(n)
+    matched_weight = np.zeros(n)
+    roles = soa["roles"][rows]
+    role_vocab = soa["role_vocab"]
+    query_sets = _query_sets(search_filters)
+
     # User type match (highest weight)
     if search_filters.user_type:
         total_weight += 30
-        if user_profile.get('role') == search_filters.user_type:
-            matched_weight += 30
-    
+        matched_weight += 30 * (roles == role_vocab.get(search_filters.user_type, -2))
+
     # Fund type match
     if search_filters.fund_type:
         total_weight += 20
-        if user_profile.get('fund_type') == search_filters.fund_type:
-            matched_weight += 20
-    
+        matched_weight += 20 * (soa["fund_types"][rows] == soa["fund_type_vocab"].get(search_filters.fund_type, -2))
+
     # Fund size range match
     if search_filters.min_fund_size is not None or search_filters.max_fund_size is not None:
         total_weight += 15
-        fund_size = user_profile.get('fund_size')
-        if fund_size is not None:
-            if ((search_filters.min_fund_size is None or fund_size >= search_filters.min_fund_size) and
-                (search_filters.max_fund_size is None or fund_size <= search_filters.max_fund_size)):
-                matched_weight += 15
-    
+        matched_weight += 15 * _in_range(
+            soa["fund_sizes"][rows], search_filters.min_fund_size, search_filters.max_fund_size
+        )
+
     # Investment focus match
     if search_filters.investment_focus:
         total_weight += 20
-        user_focus = set(user_profile.get('investment_focus', []))
-        search_focus = set(search_filters.investment_focus)
-        if user_focus & search_focus:  # If there's any overlap
-            overlap_ratio = len(user_focus & search_focus) / len(search_focus)
-            matched_weight += 20 * overlap_ratio
-    
+        matched_weight += 20 * _overlap_ratio(
+            soa["investment_focus"][rows], soa["investment_focus_vocab"], query_sets['investment_focus']
+        )
+
     # Historical returns match
     if search_filters.min_historical_returns is not None:
         total_weight += 10
-        user_returns = user_profile.get('historical_returns')
-        if user_returns is not None and user_returns >= search_filters.min_historical_returns:
-            matched_weight += 10
-    
+        matched_weight += 10 * _in_range(soa["historical_returns"][rows], search_filters.min_historical_returns, None)
+
     # Risk profile match
     if search_filters.risk_profile:
         total_weight += 5
-        if user_profile.get('risk_profile') == search_filters.risk_profile:
-            matched_weight += 5
-            
+        matched_weight += 5 * (soa["risk_profiles"][rows] == soa["risk_profile_vocab"].get(search_filters.risk_profile, -2))
+
     # Investment horizon compatibility
     if search_filters.min_investment_horizon is not None or search_filters.max_investment_horizon is not None:
         total_weight += 10
-        user_horizon = user_profile.get('investment_horizon')
-        if user_horizon is not None:
-            if ((search_filters.min_investment_horizon is None or 
-                 user_horizon >= search_filters.min_investment_horizon) and
-                (search_filters.max_investment_horizon is None or 
-                 user_horizon <= search_filters.max_investment_horizon)):
-                matched_weight += 10
-    
+        matched_weight += 10 * _in_range(
+            soa["investment_horizons"][rows],
+            search_filters.min_investment_horizon,
+            search_filters.max_investment_horizon
+        )
+
     # Investment size compatibility
     if search_filters.min_investment_size is not None or search_filters.max_investment_size is not None:
         total_weight += 15
-        user_min = user_profile.get('minimum_investment')
-        user_max = user_profile.get('typical_investment_size') or user_profile.get('fund_size')
-        
-        if user_min is not None and user_max is not None:
-            if ((search_filters.min_investment_size is None or 
-                 user_max >= search_filters.min_investment_size) and
-                (search_filters.max_investment_size is None or 
-                 user_min <= search_filters.max_investment_size)):
-                matched_weight += 15
-    
+        user_min = soa["minimum_investments"][rows]
+        user_max = soa["maximum_investments"][rows]
+        overlaps = _in_range(user_max, search_filters.min_investment_size, None) & \
+            _in_range(user_min, None, search_filters.max_investment_size)
+        matched_weight += 15 * overlaps
+
     # Capital raiser specific matching
-    if user_profile.get('role') == 'capital_raiser' or search_filters.user_type == 'capital_raiser':
-        if search_filters.deal_size_range:
-            total_weight += 10
-            user_deal_size = user_profile.get('typical_deal_size')
-            min_deal, max_deal = search_filters.deal_size_range
-            
-            if user_deal_size and min_deal <= user_deal_size <= max_deal:
-                matched_weight += 10
-        
-        # Industry focus match for capital raisers (higher weight)
-        if search_filters.investment_focus:
-            total_weight += 25
-            user_focus = set(user_profile.get('industry_focus', []))
-            search_focus = set(search_filters.investment_focus)
-            if user_focus & search_focus:
-                overlap_ratio = len(user_focus & search_focus) / len(search_focus)
-                matched_weight += 25 * overlap_ratio
-    
+    if search_filters.user_type == 'capital_raiser':
+        capital_raisers = np.ones(n, dtype=bool)
+    else:
+        capital_raisers = roles == role_vocab.get('capital_raiser', -2)
+    if search_filters.deal_size_range:
+        min_deal, max_deal = search_filters.deal_size_range
+        total_weight += 10 * capital_raisers
+        matched_weight += 10 * (capital_raisers & _in_range(soa["deal_sizes"][rows], min_deal, max_deal))
+    # Industry focus match for capital raisers (higher weight)
+    if search_filters.investment_focus:
+        total_weight += 25 * capital_raisers
+        matched_weight += 25 * capital_raisers * _overlap_ratio(
+            soa["industry_focus"][rows], soa["industry_focus_vocab"], query_sets['investment_focus']
+        )
+
     # Experience matching
     if search_filters.min_years_experience is not None:
-        total_weight += weights['experience']
-        user_experience = user_profile.get('years_experience')
-        if user_experience is not None and user_experience >= search_filters.min_years_experience:
-            matched_weight += weights['experience']
-    
+        total_weight += 15
+        matched_weight += 15 * _in_range(soa["years_experience"][rows], search_filters.min_years_experience, None)
+
     # Sector matching
     if search_filters.sectors:
-        total_weight += weights['sectors']
-        user_sectors = set(user_profile.get('sectors', []))
-        search_sectors = set(search_filters.sectors)
-        if user_sectors & search_sectors:  # If there's any overlap
-            overlap_ratio = len(user_sectors & search_sectors) / len(search_sectors)
-            matched_weight += weights['sectors'] * overlap_ratio
-    
+        total_weight += 20
+        matched_weight += 20 * _overlap_ratio(soa["sectors"][rows], soa["sectors_vocab"], query_sets['sectors'])
+
     # Track record requirement
     if search_filters.track_record_required:
-        total_weight += weights['track_record']
-        user_track_record = user_profile.get('track_record', [])
-        if user_track_record:  # If user has any track record
-            matched_weight += weights['track_record']
-    
+        total_weight += 10
+        matched_weight += 10 * soa["has_track_record"][rows]
+
     # Calculate final percentage
-    return (matched_weight / total_weight * 100) if total_weight > 0 else 0
+    scores = np.zeros(n)
+    np.divide(matched_weight * 100, total_weight, out=scores, where=total_weight > 0)
+    return scores
 
-@router.post("/presets", response_model=SearchPreset)
+@router.post("/presets", response_class=ORJSONResponse)
 def create_search_preset(preset: SearchPreset) -> SearchPreset:
     """Create a new search preset"""
     try:
-        presets = db.storage.json.get("search_presets", default={})
-        presets[preset.id] = preset.dict()
-        db.storage.json.put("search_presets", presets)
-        return preset
+        preset_data = preset.model_dump(mode="json")
+        db.storage.json.put(get_search_preset_key(preset.id), preset_data)
+        
+        # Add to the owner's preset index
+        preset_ids = _load_user_preset_ids(preset.user_id)
+        if preset.id not in preset_ids:
+            preset_ids.append(preset.id)
+            db.storage.json.put(get_user_presets_index_key(preset.user_id), preset_ids)
+        return ORJSONResponse(preset_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating preset: {str(e)}") from e
 
-@router.get("/presets/{user_id}", response_model=List[SearchPreset])
+@router.get("/presets/{user_id}", response_class=ORJSONResponse)
 def get_user_presets(user_id: str) -> List[SearchPreset]:
     """Get all search presets for a user"""
     try:
-        presets = db.storage.json.get("search_presets", default={})
-        user_presets = [SearchPreset(**preset) for preset in presets.values() 
-                       if preset["user_id"] == user_id]
-        return sorted(user_presets, key=lambda x: x.last_used or x.created_at, reverse=True)
+        preset_ids = _load_user_preset_ids(user_id)
+        user_presets = []
+        for preset_id in preset_ids:
+            preset = db.storage.json.get(get_search_preset_key(preset_id), default=None)
+            if preset:
+                user_presets.append(SearchPreset(**preset))
+        user_presets.sort(key=lambda x: x.last_used or x.created_at, reverse=True)
+        return ORJSONResponse([preset.model_dump(mode="json") for preset in user_presets])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving presets: {str(e)}") from e
 
-@router.delete("/presets/{preset_id}")
+@router.delete("/presets/{preset_id}", response_class=ORJSONResponse)
 def delete_search_preset(preset_id: str):
     """Delete a search preset"""
     try:
-        presets = db.storage.json.get("search_presets", default={})
-        if preset_id not in presets:
+        preset_key = get_search_preset_key(preset_id)
+        preset = _load_preset(preset_id)
+        if not preset:
             raise HTTPException(status_code=404, detail="Preset not found")
-        del presets[preset_id]
-        db.storage.json.put("search_presets", presets)
-        return {"status": "success", "message": "Preset deleted successfully"}
+        db.storage.json.delete(preset_key)
+        
+        # Remove from the owner's preset index
+        preset_ids = _load_user_preset_ids(preset["user_id"])
+        if preset_id in preset_ids:
+            preset_ids.remove(preset_id)
+            db.storage.json.put(get_user_presets_index_key(preset["user_id"]), preset_ids)
+        return ORJSONResponse({"status": "success", "message": "Preset deleted successfully"})
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting preset: {str(e)}") from e
 
-@router.get("/history/{user_id}", response_model=List[SearchHistoryEntry])
+@router.get("/history/{user_id}", response_class=ORJSONResponse)
 def get_search_history(user_id: str, limit: Optional[int] = 10) -> List[SearchHistoryEntry]:
     """Get search history for a user"""
     try:
-        history = db.storage.json.get("search_history", default={})
-        user_history = [SearchHistoryEntry(**entry) for entry in history.values() 
-                       if entry["user_id"] == user_id]
-        return sorted(user_history, key=lambda x: x.timestamp, reverse=True)[:limit]
+        history = _load_search_history(user_id)
+        # Pick the latest entries before validating, so only returned ones become models
+        latest = sorted(history, key=lambda entry: entry["timestamp"], reverse=True)[:limit]
+        user_history = [SearchHistoryEntry(**entry) for entry in latest]
+        return ORJSONResponse([entry.model_dump(mode="json") for entry in user_history])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving search history: {str(e)}") from e
 
-@router.post("/users/search", response_model=PaginatedSearchResponse)
+@router.post("/users/search", response_class=ORJSONResponse)
 async def search_users(filters: SearchFilters, user_id: Optional[str] = None) -> PaginatedSearchResponse:
     """Search for users based on filters and optionally save to history
     
@@ -250,129 +448,134 @@ async def search_users(filters: SearchFilters, user_id: Optional[str] = None) ->
     returns an empty response with total=0.
     """
     try:
-        # Perform the search
-        results = await _perform_search(filters)
+        # Perform the search, ranking only as many results as this page needs
+        end_idx = filters.page * filters.page_size
+        start_idx = end_idx - filters.page_size
+        results, total_results = await _perform_search(filters, limit=end_idx, offset=start_idx)
         
-        # If user_id is provided, save to search history
+        # If user_id is provided, save to search history without making the
+        # response wait on the storage write
         if user_id:
             try:
                 history_entry = SearchHistoryEntry(
                     id=str(int(datetime.now().timestamp())),
                     user_id=user_id,
                     filters=filters,
-                    results_count=len(results),
+                    results_count=total_results,
                     timestamp=datetime.now().isoformat()
                 )
-                
-                history = db.storage.json.get("search_history", default={})
-                history[history_entry.id] = history_entry.dict()
-                db.storage.json.put("search_history", history)
-                
-                print(f"[DEBUG] Saved search history for user {user_id}")
+                task = asyncio.create_task(asyncio.to_thread(_save_search_history, history_entry))
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
             except Exception as history_error:
                 print(f"[ERROR] Failed to save search history: {str(history_error)}")
         
         # Calculate pagination
-        total_results = len(results)
         total_pages = (total_results + filters.page_size - 1) // filters.page_size
-        start_idx = (filters.page - 1) * filters.page_size
-        end_idx = start_idx + filters.page_size
         
         # Return paginated response
-        return PaginatedSearchResponse(
-            items=results[start_idx:end_idx],
+        response = PaginatedSearchResponse(
+            items=results,
             total=total_results,
             page=filters.page,
             page_size=filters.page_size,
             total_pages=total_pages
         )
+        # Serialize with pydantic-core directly instead of jsonable_encoder
+        return Response(content=response.model_dump_json(), media_type="application/json")
     except Exception as e:
         print(f"[ERROR] Critical error in search: {str(e)}")
         print(f"[ERROR] Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Error searching users: {str(e)}") from e
 
-async def _perform_search(filters: SearchFilters) -> List[SearchResult]:
-    """Internal function to perform the search"""
+async def _perform_search(
+    filters: SearchFilters,
+    limit: Optional[int] = None,
+    offset: int = 0
+) -> Tuple[List[SearchResult], int]:
+    """Internal function to perform the search
+    
+    Ranks matches by score, keeps the best ``limit`` (all if no limit is
+    given) and returns those from ``offset`` onwards, highest match first,
+    together with the total number of matches.
+    """
     try:
         print(f"[DEBUG] Search initiated with filters: {filters}")
         
         # Get all user profiles
-        profiles = db.storage.json.get("user_profiles", default={})
-        print(f"[DEBUG] Retrieved {len(profiles)} profiles from storage")
+        profiles, soa = _get_cached_profiles()
+        print(f"[DEBUG] Retrieved {len(profiles)} profiles from cache")
         if not profiles:
             print("[WARNING] No profiles found in storage")
-            return []
+            return [], 0
         
         print(f"[DEBUG] Found {len(profiles)} profiles")
-        results = []
         
-        # Process each profile
-        for uid, profile in profiles.items():
+        # Score the role-compatible profiles in one vectorized pass, reusing
+        # scores for filters already seen (e.g. when paging through a search)
+        filter_key = _get_filter_key(filters)
+        try:
+            rows, scores = soa["scores"][filter_key]
+        except KeyError:
+            rows = _candidate_rows(soa, filters)
+            scores = _score_profiles(soa, filters, rows)
+            soa["scores"][filter_key] = (rows, scores)
+        
+        # Only include results with a match percentage > 0
+        matches = np.flatnonzero(scores > 0).tolist()
+        
+        # Text search in company name or display name
+        if filters.search_query:
+            query = filters.search_query.lower()
+            company_names = soa["company_names"]
+            display_names = soa["display_names"]
+            matches = [
+                idx for idx in matches
+                if query in company_names[rows[idx]] or query in display_names[rows[idx]]
+            ]
+        
+        # Rank matches by match percentage (highest first). A bounded heap
+        # avoids sorting every match when only the first pages are returned.
+        total_results = len(matches)
+        if limit is not None:
+            ranked = heapq.nlargest(limit, matches, key=scores.__getitem__)
+        else:
+            ranked = sorted(matches, key=scores.__getitem__, reverse=True)
+        
+        # Build result models only for the returned slice, from the profiles
+        # already validated with the snapshot
+        results = []
+        for idx in ranked[offset:]:
+            row = rows[idx]
             try:
-                # Skip demo user
-                if uid == "demo_user_1":
-                    continue
-                    
-                # Text search in company name or display name
-                if filters.search_query:
-                    query = filters.search_query.lower()
-                    company_name = profile.get('company_name', '').lower()
-                    display_name = profile.get('display_name', '').lower()
-                    
-                    if query not in company_name and query not in display_name:
-                        continue
-                
-                # Check cache for match percentage
-                cache_key = _get_cache_key(uid, filters)
-                if cache_key in _match_cache:
-                    match_percentage = _match_cache[cache_key]
-                else:
-                    match_percentage = calculate_match_percentage(profile, filters)
-                    _match_cache[cache_key] = match_percentage
-                    
-                    # Clear match cache if it gets too large
-                    if len(_match_cache) > 10000:  # Limit cache size
-                        _match_cache.clear()
-                
-                # Only include results with a match percentage > 0
-                if match_percentage > 0:
-                    try:
-                        result = SearchResult(
-                            profile=ExtendedUserProfile(**profile),
-                            match_percentage=match_percentage
-                        )
-                        results.append(result)
-                    except Exception as validation_error:
-                        print(f"[ERROR] Failed to create SearchResult for {uid}: {str(validation_error)}")
-                        print(f"[ERROR] Profile data causing error: {profile}")
-
-                    
-            except Exception as profile_error:
-                print(f"[ERROR] Error processing profile {uid}: {str(profile_error)}")
-                print(f"[ERROR] Traceback: {traceback.format_exc()}")
-                continue
+                result = SearchResult(
+                    profile=soa["models"][row],
+                    match_percentage=float(scores[idx])
+                )
+                results.append(result)
+            except Exception as validation_error:
+                print(f"[ERROR] Failed to create SearchResult for {soa['uids'][row]}: {str(validation_error)}")
         
-        # Sort results by match percentage (highest first)
-        results.sort(key=lambda x: x.match_percentage, reverse=True)
-        print(f"[INFO] Search completed. Found {len(results)} matches")
-        return results
+        print(f"[INFO] Search completed. Found {total_results} matches")
+        return results, total_results
     except Exception as e:
         print(f"[ERROR] Critical error in search: {str(e)}")
         print(f"[ERROR] Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Error searching users: {str(e)}") from e
 
-@router.put("/presets/{preset_id}/last-used")
+@router.put("/presets/{preset_id}/last-used", response_class=ORJSONResponse)
 def update_preset_last_used(preset_id: str):
     """Update the last used timestamp of a preset"""
     try:
-        presets = db.storage.json.get("search_presets", default={})
-        if preset_id not in presets:
+        preset_key = get_search_preset_key(preset_id)
+        preset = _load_preset(preset_id)
+        if not preset:
             raise HTTPException(status_code=404, detail="Preset not found")
             
-        presets[preset_id]["last_used"] = datetime.now().isoformat()
-        db.storage.json.put("search_presets", presets)
+        preset["last_used"] = datetime.now().isoformat()
+        db.storage.json.put(preset_key, preset)
         
-        return {"status": "success", "message": "Last used timestamp updated successfully"}
+        return ORJSONResponse({"status": "success", "message": "Last used timestamp updated successfully"})
     except HTTPException:
         raise
     except Exception as e:
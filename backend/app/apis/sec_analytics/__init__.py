@@ -1,12 +1,16 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import Dict, List, Optional, Any
 from datetime import datetime
+import asyncio
+from functools import lru_cache
 from sec_api import QueryApi
+import threading
 import databutton as db
-from collections import defaultdict
+import numpy as np
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 class PortfolioHolding(BaseModel):
     ticker: str
@@ -69,8 +73,9 @@ class ComprehensiveAnalytics(BaseModel):
     investment_policies: List[Dict[str, str]]
     risk_factors: List[str]
 
+@lru_cache(maxsize=1)
 def get_sec_api_key() -> str:
-    """Get SEC API key from secrets"""
+    """Get SEC API key from secrets (cached after the first successful read)"""
     api_key = db.secrets.get("SEC_API_KEY")
     if not api_key:
         raise HTTPException(
@@ -79,9 +84,21 @@ def get_sec_api_key() -> str:
         )
     return api_key
 
+_query_api: Optional[QueryApi] = None
+_query_api_lock = threading.Lock()
+
+def get_query_api() -> QueryApi:
+    """Get the shared SEC QueryApi client, creating it on first use"""
+    global _query_api
+    if _query_api is None:
+        with _query_api_lock:
+            if _query_api is None:
+                _query_api = QueryApi(api_key=get_sec_api_key())
+    return _query_api
+
 def fetch_13f_data(cik: str) -> dict:
     """Fetch and analyze 13F filings"""
-    queryApi = QueryApi(api_key=get_sec_api_key())
+    queryApi = get_query_api()
     
     # Get latest 13F filing
     query = {
@@ -102,41 +119,55 @@ def fetch_13f_data(cik: str) -> dict:
     filing = response['filings'][0]
     holdings = filing.get('holdings', [])
     
-    # Calculate total portfolio value
-    total_value = sum(float(h.get('value', 0)) for h in holdings)
+    # Extract the columns once, then do the arithmetic over whole arrays
+    values = np.fromiter((float(h.get('value', 0)) for h in holdings), dtype=np.float64, count=len(holdings))
+    industries = [h.get('industryTitle', 'Other') for h in holdings]
     
-    # Process holdings
-    processed_holdings = []
-    industry_allocations = defaultdict(lambda: {'value': 0, 'count': 0})
+    # Calculate total portfolio value and per-holding percentages
+    total_value = float(values.sum())
+    inv_total = 100.0 / total_value if total_value > 0 else 0.0
+    percentages = values * inv_total
     
-    for holding in holdings:
-        value = float(holding.get('value', 0))
-        percentage = (value / total_value * 100) if total_value > 0 else 0
-        
-        processed_holding = PortfolioHolding(
-            ticker=holding.get('cusip', ''),
-            company_name=holding.get('nameOfIssuer', ''),
-            value=value,
-            shares=int(holding.get('shares', 0)),
-            percentage=percentage,
-            industry=holding.get('industryTitle', 'Other')
-        )
-        processed_holdings.append(processed_holding)
-        
-        # Update industry allocations
-        industry = holding.get('industryTitle', 'Other')
-        industry_allocations[industry]['value'] += value
-        industry_allocations[industry]['count'] += 1
+    # Process holdings straight into PortfolioHolding-shaped dicts
+    processed_holdings = [
+        {
+            'ticker': holding.get('cusip', ''),
+            'company_name': holding.get('nameOfIssuer', ''),
+            'value': value,
+            'shares': int(holding.get('shares', 0)),
+            'percentage': percentage,
+            'industry': industry,
+            'quarter_change': None
+        }
+        for holding, value, percentage, industry
+        in zip(holdings, values.tolist(), percentages.tolist(), industries)
+    ]
     
-    # Convert industry allocations
+    # Map industries to dense ids (in first-seen order) and reduce per id
+    industry_ids_by_name: Dict[Optional[str], int] = {}
+    industry_ids = np.fromiter(
+        (industry_ids_by_name.setdefault(industry, len(industry_ids_by_name)) for industry in industries),
+        dtype=np.intp,
+        count=len(industries)
+    )
+    industry_values = np.bincount(industry_ids, weights=values, minlength=len(industry_ids_by_name))
+    industry_counts = np.bincount(industry_ids, minlength=len(industry_ids_by_name))
+    industry_percentages = industry_values * inv_total
+    
+    # Convert industry allocations into IndustryAllocation-shaped dicts
     industry_alloc_list = [
-        IndustryAllocation(
-            industry=industry,
-            percentage=(data['value'] / total_value * 100) if total_value > 0 else 0,
-            value=data['value'],
-            holdings_count=data['count']
+        {
+            'industry': industry,
+            'percentage': percentage,
+            'value': value,
+            'holdings_count': count
+        }
+        for industry, percentage, value, count in zip(
+            industry_ids_by_name,
+            industry_percentages.tolist(),
+            industry_values.tolist(),
+            industry_counts.tolist()
         )
-        for industry, data in industry_allocations.items()
     ]
     
     return {
@@ -174,25 +205,28 @@ def fetch_adv_data(cik: str) -> dict:
         ]
     }
 
-@router.get("/analytics/{cik}")
+@router.get("/analytics/{cik}", response_class=ORJSONResponse)
 async def get_comprehensive_analytics(cik: str) -> ComprehensiveAnalytics:
     """Get comprehensive analytics for an investment manager"""
     try:
-        # Fetch data from different sources
-        f13_data = fetch_13f_data(cik)
-        adv_data = fetch_adv_data(cik)
+        # Fetch data from different sources concurrently; both clients are sync
+        f13_data, adv_data = await asyncio.gather(
+            asyncio.to_thread(fetch_13f_data, cik),
+            asyncio.to_thread(fetch_adv_data, cik)
+        )
         
         # Combine all data
         # Convert Pydantic models to dictionaries
         client_types = [ct.dict() for ct in adv_data.get('client_types', [])] 
         fee_structures = [fs.dict() for fs in adv_data.get('fee_structures', [])]
-        holdings = [h.dict() for h in f13_data.get('holdings', [])]
-        industry_allocation = [ia.dict() for ia in f13_data.get('industry_allocation', [])]
         
-        return ComprehensiveAnalytics(
+        # The parts are already plain dicts of the declared shape; constructing
+        # directly avoids validating (and copying) every holding a second time
+        # before the response model does
+        return ComprehensiveAnalytics.model_construct(
             total_aum=f13_data.get('total_aum', 0),
-            holdings=holdings,
-            industry_allocation=industry_allocation,
+            holdings=f13_data.get('holdings', []),
+            industry_allocation=f13_data.get('industry_allocation', []),
             quarterly_changes=[],  # TODO: Implement historical analysis
             
             # Form ADV data
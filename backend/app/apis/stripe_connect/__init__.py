@@ -1,19 +1,23 @@
 from datetime import datetime
+import time
 from typing import Optional, Dict, List
 from enum import Enum
 from pydantic import BaseModel, Field
 from fastapi import APIRouter, HTTPException
-import databutton as db
+from fastapi.responses import ORJSONResponse
+from cachetools import TTLCache
 import stripe
 from app.apis.stripe_connect_utils import (
     validate_currency,
     validate_country,
     mock_create_connect_account,
+    get_storage_blob,
+    put_storage_blob,
     generate_mock_onboarding_url,
     validate_payout_amount
 )
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 class ConnectAccountStatus(str, Enum):
     PENDING = "pending"
@@ -29,13 +33,15 @@ class ConnectAccountType(str, Enum):
     @classmethod
     def validate(cls, value: str) -> str:
         """Validate and normalize account type"""
-        try:
-            return cls(value.lower())
-        except ValueError:
+        normalized = value.lower()
+        if normalized not in cls._VALUES:
             raise HTTPException(
                 status_code=400,
                 detail=f"Invalid account type: {value}. Must be one of {[e.value for e in cls]}"
             )
+        return cls(normalized)
+
+ConnectAccountType._VALUES = frozenset(e.value for e in ConnectAccountType)
 
 class ConnectAccount(BaseModel):
     id: str
@@ -78,13 +84,58 @@ class PayoutResponse(BaseModel):
 # Initialize Stripe when we have the API key
 # stripe.api_key = db.secrets.get("STRIPE_SECRET_KEY")
 
+# Short-lived in-process copy of the accounts blob for read-only requests;
+# write paths read fresh with read_connect_accounts and
+# save_connect_accounts drops the cached copy
+ACCOUNTS_CACHE_TTL = 5  # seconds
+_accounts_cache = TTLCache(maxsize=2, ttl=ACCOUNTS_CACHE_TTL)
+
+def read_connect_accounts() -> Dict[str, ConnectAccount]:
+    """Read all Connect accounts straight from storage, bypassing the cache, before modifying them"""
+    return get_storage_blob('stripe_connect_accounts', default={})
+
 def get_connect_accounts() -> Dict[str, ConnectAccount]:
-    """Get all Connect accounts from storage"""
-    return db.storage.json.get('stripe_connect_accounts', default={})
+    """Get all Connect accounts from storage (read-only)"""
+    try:
+        return _accounts_cache['accounts']
+    except KeyError:
+        accounts = read_connect_accounts()
+        _accounts_cache['accounts'] = accounts
+        return accounts
 
 def save_connect_accounts(accounts: Dict[str, ConnectAccount]) -> None:
     """Save Connect accounts to storage"""
-    db.storage.json.put('stripe_connect_accounts', accounts)
+    try:
+        put_storage_blob('stripe_connect_accounts', accounts)
+        save_user_index(build_user_index(accounts))
+    finally:
+        _accounts_cache.clear()
+
+def build_user_index(accounts: Dict[str, ConnectAccount]) -> Dict[str, List[str]]:
+    """Map each user_id to the IDs of their Connect accounts"""
+    user_index: Dict[str, List[str]] = {}
+    for account_id, account in accounts.items():
+        user_index.setdefault(account['user_id'], []).append(account_id)
+    return user_index
+
+def get_user_index() -> Dict[str, List[str]]:
+    """Get the user_id -> account IDs index, rebuilding it if it was never stored"""
+    try:
+        return _accounts_cache['user_index']
+    except KeyError:
+        pass
+    user_index = get_storage_blob('stripe_connect_accounts_user_index')
+    if user_index is None:
+        user_index = build_user_index(get_connect_accounts())
+    _accounts_cache['user_index'] = user_index
+    return user_index
+
+def save_user_index(user_index: Dict[str, List[str]]) -> None:
+    """Save the user_id -> account IDs index to storage"""
+    try:
+        put_storage_blob('stripe_connect_accounts_user_index', user_index)
+    finally:
+        _accounts_cache.pop('user_index', None)
 
 @router.post("/stripe/connect/create-account", response_model=ConnectAccountResponse)
 def create_connect_account(request: CreateConnectAccountRequest):
@@ -102,15 +153,16 @@ def create_connect_account(request: CreateConnectAccountRequest):
         country = validate_country(request.country)
         currency = validate_currency(request.default_currency)
         
-        # Check if user already has an account
-        accounts = get_connect_accounts()
+        # Check if user already has an account, against fresh data since the
+        # new account is saved back into it; one scan is cheaper than indexing
+        accounts = read_connect_accounts()
         for acc in accounts.values():
-            if acc['user_id'] == request.user_id:
-                if acc['status'] not in [ConnectAccountStatus.DISABLED, ConnectAccountStatus.REJECTED]:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="User already has an active Connect account"
-                    )
+            if acc['user_id'] == request.user_id and \
+                    acc['status'] not in [ConnectAccountStatus.DISABLED, ConnectAccountStatus.REJECTED]:
+                raise HTTPException(
+                    status_code=400,
+                    detail="User already has an active Connect account"
+                )
         
         # Create mock Stripe account for now
         stripe_account = mock_create_connect_account(
@@ -120,8 +172,8 @@ def create_connect_account(request: CreateConnectAccountRequest):
             currency=currency
         )
         
-        # Create local account record
-        account = ConnectAccount(
+        # Create local account record; every field is already validated above
+        account = ConnectAccount.model_construct(
             id=stripe_account['id'],
             user_id=request.user_id,
             stripe_id=stripe_account['id'],
@@ -135,8 +187,7 @@ def create_connect_account(request: CreateConnectAccountRequest):
         )
         
         # Store the account
-        accounts = get_connect_accounts()
-        accounts[account.id] = account.dict()
+        accounts[account.id] = account.model_dump(mode='json')
         save_connect_accounts(accounts)
         
         return ConnectAccountResponse(
@@ -148,7 +199,13 @@ def create_connect_account(request: CreateConnectAccountRequest):
         print(f"[ERROR] Failed to create Connect account: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e)) from e
 
-@router.get("/stripe/connect/account/{account_id}", response_model=ConnectAccount)
+# Stored accounts are already in ConnectAccount's dict form, so the read
+# endpoints return them as-is and only declare the model for the schema
+@router.get(
+    "/stripe/connect/account/{account_id}",
+    response_model=None,
+    responses={200: {"model": ConnectAccount}}
+)
 def get_connect_account(account_id: str):
     """Get a specific Connect account"""
     try:
@@ -156,7 +213,7 @@ def get_connect_account(account_id: str):
         if account_id not in accounts:
             raise HTTPException(status_code=404, detail="Connect account not found")
             
-        return accounts[account_id]
+        return ORJSONResponse(accounts[account_id])
         
     except HTTPException:
         raise
@@ -164,18 +221,20 @@ def get_connect_account(account_id: str):
         print(f"[ERROR] Failed to get Connect account: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e)) from e
 
-@router.get("/stripe/connect/accounts/user/{user_id}", response_model=List[ConnectAccount])
+@router.get(
+    "/stripe/connect/accounts/user/{user_id}",
+    response_model=None,
+    responses={200: {"model": List[ConnectAccount]}}
+)
 def get_user_connect_accounts(user_id: str):
     """Get all Connect accounts for a user"""
     try:
         accounts = get_connect_accounts()
-        user_accounts = []
-        
-        for account in accounts.values():
-            if account['user_id'] == user_id:
-                user_accounts.append(account)
-                
-        return user_accounts
+        return ORJSONResponse([
+            accounts[account_id]
+            for account_id in get_user_index().get(user_id, [])
+            if account_id in accounts
+        ])
         
     except Exception as e:
         print(f"[ERROR] Failed to get user Connect accounts: {str(e)}")
@@ -216,11 +275,12 @@ def create_payout(request: PayoutRequest):
         )
         
         # Mock payout creation
+        now = time.time()
         mock_payout = {
-            "id": f"mock_po_{int(datetime.utcnow().timestamp())}",
+            "id": f"mock_po_{int(now)}",
             "object": "payout",
             "amount": amount_in_cents,
-            "arrival_date": int((datetime.utcnow().timestamp() + 86400)),  # +24h
+            "arrival_date": int(now + 86400),  # +24h
             "currency": currency,
             "description": None,
             "destination": f"ba_mock_{request.connect_account_id}",
@@ -1,13 +1,48 @@
-from datetime import datetime
-from typing import Optional, Dict, Tuple
+import time
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Dict, Tuple
 from fastapi import APIRouter, HTTPException
+import orjson
 
 router = APIRouter()
 import databutton as db
+from app.apis.utils import sanitize_key
+
+def get_storage_blob(key: str, default: Any = None) -> Any:
+    """Read an orjson-encoded blob from binary storage
+    
+    Blobs written before the switch to orjson live in JSON storage under the
+    same key; they are read from there once, rewritten in binary form and the
+    JSON copy is deleted. Only a missing binary blob triggers that fallback,
+    any other storage error propagates.
+    """
+    try:
+        blob = db.storage.binary.get(f"{key}.orjson")
+    except FileNotFoundError:
+        data = db.storage.json.get(key, default=default)
+        if data is not default:
+            put_storage_blob(key, data)
+            # Drop the legacy copy so it can never be migrated over newer data
+            db.storage.json.delete(key)
+        return data
+    return orjson.loads(blob)
+
+def put_storage_blob(key: str, data: Any) -> None:
+    """Write a blob to binary storage with orjson"""
+    db.storage.binary.put(f"{key}.orjson", orjson.dumps(data))
+
+def get_test_account_key(account_id: str) -> str:
+    """Get the storage key for a single mock Connect account"""
+    return sanitize_key(f"stripe_test_account.{account_id}")
+
+def get_test_state_key(account_id: str) -> str:
+    """Get the storage key for a single test account's state"""
+    return sanitize_key(f"stripe_test_state.{account_id}")
 
 # Test mode configuration
 TEST_MODE_ENABLED = True  # Can be controlled via environment variable
-TEST_ACCOUNT_STATES = {
+# States are shared read-only views, so callers can't corrupt them by mutation
+TEST_ACCOUNT_STATES = {state: MappingProxyType(flags) for state, flags in {
     'pending': {
         'charges_enabled': False,
         'payouts_enabled': False,
@@ -26,9 +61,17 @@ TEST_ACCOUNT_STATES = {
         'details_submitted': True,
         'requirements_status': 'restricted'
     }
-}
+}.items()}
+
+SUPPORTED_CURRENCIES = frozenset({'usd', 'eur', 'gbp', 'aud', 'cad'})
+SUPPORTED_COUNTRIES = frozenset({'US', 'GB', 'CA', 'AU', 'FR', 'DE', 'ES', 'IT', 'NL', 'BE', 'IE'})
+# Minor units per major unit, and the smallest payout in minor units
+_MINOR_UNIT_MULTIPLIERS = {currency: 100 for currency in SUPPORTED_CURRENCIES}
+_MIN_PAYOUT_UNITS = {currency: 100 for currency in SUPPORTED_CURRENCIES}
+_SUPPORTED_CURRENCIES_TEXT = str(sorted(SUPPORTED_CURRENCIES))
+_SUPPORTED_COUNTRIES_TEXT = str(sorted(SUPPORTED_COUNTRIES))
 
-def get_test_account_state(account_id: str) -> Dict:
+def get_test_account_state(account_id: str) -> Mapping:
     """Get the current state of a test account
     
     In test mode, accounts cycle through different states to simulate
@@ -41,10 +84,16 @@ def get_test_account_state(account_id: str) -> Dict:
         )
         
     # Get stored state or default to pending
-    states = db.storage.json.get('stripe_test_states', default={})
-    return states.get(account_id, TEST_ACCOUNT_STATES['pending'])
+    state = get_storage_blob(get_test_state_key(account_id))
+    if state is None:
+        # States used to share one dict; move this account's entry out of it
+        state = get_storage_blob('stripe_test_states', default={}).get(account_id)
+        if state is None:
+            return TEST_ACCOUNT_STATES['pending']
+        put_storage_blob(get_test_state_key(account_id), state)
+    return state
 
-def update_test_account_state(account_id: str, new_state: str) -> Dict:
+def update_test_account_state(account_id: str, new_state: str) -> Mapping:
     """Update the state of a test account
     
     Args:
@@ -52,7 +101,7 @@ def update_test_account_state(account_id: str, new_state: str) -> Dict:
         new_state: The new state to set (pending, verified, restricted)
         
     Returns:
-        Dict containing the new account state
+        Read-only mapping of the new account state
     """
     if new_state not in TEST_ACCOUNT_STATES:
         raise HTTPException(
@@ -60,102 +109,76 @@ def update_test_account_state(account_id: str, new_state: str) -> Dict:
             detail=f"Invalid state {new_state}. Must be one of {list(TEST_ACCOUNT_STATES.keys())}"
         )
         
-    states = db.storage.json.get('stripe_test_states', default={})
-    states[account_id] = TEST_ACCOUNT_STATES[new_state]
-    db.storage.json.put('stripe_test_states', states)
+    put_storage_blob(get_test_state_key(account_id), dict(TEST_ACCOUNT_STATES[new_state]))
     
-    return states[account_id]
+    return TEST_ACCOUNT_STATES[new_state]
 
 def validate_currency(currency: str) -> str:
     """Validate and normalize currency code"""
     currency = currency.lower()
-    supported_currencies = {'usd', 'eur', 'gbp', 'aud', 'cad'}
-    if currency not in supported_currencies:
+    if currency not in SUPPORTED_CURRENCIES:
         raise HTTPException(
             status_code=400,
-            detail=f"Currency {currency} not supported. Must be one of {supported_currencies}"
+            detail=f"Currency {currency} not supported. Must be one of {_SUPPORTED_CURRENCIES_TEXT}"
         )
     return currency
 
 def validate_country(country: str) -> str:
     """Validate and normalize country code"""
     country = country.upper()
-    supported_countries = {'US', 'GB', 'CA', 'AU', 'FR', 'DE', 'ES', 'IT', 'NL', 'BE', 'IE'}
-    if country not in supported_countries:
+    if country not in SUPPORTED_COUNTRIES:
         raise HTTPException(
             status_code=400,
-            detail=f"Country {country} not supported. Must be one of {supported_countries}"
+            detail=f"Country {country} not supported. Must be one of {_SUPPORTED_COUNTRIES_TEXT}"
         )
     return country
 
+_BASE_REQUIREMENT_FIELDS = (
+    "external_account",
+    "business_profile.url",
+    "business_profile.mcc",
+)
+
+# Extra fields Stripe asks custom accounts for on top of the base set
+_CUSTOM_REQUIREMENT_FIELDS = (
+    "business_profile.product_description",
+    "business_profile.support_phone",
+    "company.address.city",
+    "company.address.line1",
+    "company.address.postal_code",
+    "company.address.state",
+    "company.name",
+    "company.phone",
+    "company.tax_id",
+    "representative.first_name",
+    "representative.last_name",
+    "representative.email",
+    "representative.phone",
+    "representative.dob.day",
+    "representative.dob.month",
+    "representative.dob.year",
+    "representative.address.city",
+    "representative.address.line1",
+    "representative.address.postal_code",
+    "representative.address.state",
+    "representative.ssn_last_4"
+)
+
 def get_mock_requirements(account_type: str) -> Dict:
     """Get mock requirements for different account types"""
-    base_requirements = {
-        "currently_due": [
-            "external_account",
-            "business_profile.url",
-            "business_profile.mcc",
-        ],
-        "eventually_due": [
-            "external_account",
-            "business_profile.url",
-            "business_profile.mcc",
-        ],
+    due_fields = _BASE_REQUIREMENT_FIELDS
+    if account_type == "custom":
+        due_fields = _BASE_REQUIREMENT_FIELDS + _CUSTOM_REQUIREMENT_FIELDS
+    
+    # Fresh lists per call so callers can't mutate the shared templates
+    return {
+        "currently_due": list(due_fields),
+        "eventually_due": list(due_fields),
         "current_deadline": None,
         "disabled_reason": None,
         "past_due": [],
         "pending_verification": []
     }
-    
-    if account_type == "custom":
-        base_requirements["currently_due"].extend([
-            "business_profile.product_description",
-            "business_profile.support_phone",
-            "company.address.city",
-            "company.address.line1",
-            "company.address.postal_code",
-            "company.address.state",
-            "company.name",
-            "company.phone",
-            "company.tax_id",
-            "representative.first_name",
-            "representative.last_name",
-            "representative.email",
-            "representative.phone",
-            "representative.dob.day",
-            "representative.dob.month",
-            "representative.dob.year",
-            "representative.address.city",
-            "representative.address.line1",
-            "representative.address.postal_code",
-            "representative.address.state",
-            "representative.ssn_last_4"
-        ])
-        base_requirements["eventually_due"].extend([
-            "business_profile.product_description",
-            "business_profile.support_phone",
-            "company.address.city",
-            "company.address.line1",
-            "company.address.postal_code",
-            "company.address.state",
-            "company.name",
-            "company.phone",
-            "company.tax_id",
-            "representative.first_name",
-            "representative.last_name",
-            "representative.email",
-            "representative.phone",
-            "representative.dob.day",
-            "representative.dob.month",
-            "representative.dob.year",
-            "representative.address.city",
-            "representative.address.line1",
-            "representative.address.postal_code",
-            "representative.address.state",
-            "representative.ssn_last_4"
-        ])
-    
-    return base_requirements
 
 def generate_mock_onboarding_url(account_id: str, account_type: str) -> str:
     """Generate a mock onboarding URL"""
@@ -172,19 +195,20 @@ def validate_payout_amount(amount: float, currency: str) -> Tuple[int, str]:
     
     # Convert to smallest currency unit (e.g., cents for USD)
     currency = currency.lower()
-    if currency in {'usd', 'eur', 'gbp', 'aud', 'cad'}:
-        amount_in_cents = int(amount * 100)
-        if amount_in_cents < 100:  # Minimum 1 USD/EUR/etc
-            raise HTTPException(
-                status_code=400,
-                detail=f"Minimum payout amount is 1 {currency.upper()}"
-            )
-        return amount_in_cents, currency
+    multiplier = _MINOR_UNIT_MULTIPLIERS.get(currency)
+    if multiplier is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Currency {currency} not supported"
+        )
     
-    raise HTTPException(
-        status_code=400,
-        detail=f"Currency {currency} not supported"
-    )
+    amount_in_cents = int(amount * multiplier)
+    if amount_in_cents < _MIN_PAYOUT_UNITS[currency]:  # Minimum 1 USD/EUR/etc
+        raise HTTPException(
+            status_code=400,
+            detail=f"Minimum payout amount is 1 {currency.upper()}"
+        )
+    return amount_in_cents, currency
 
 def mock_create_connect_account(user_id: str, account_type: str, country: str, currency: str, test_state: str = 'pending') -> Dict:
     """Create a mock Connect account with realistic test data
@@ -204,12 +228,11 @@ def mock_create_connect_account(user_id: str, account_type: str, country: str, c
     currency = validate_currency(currency)
     
     # Create mock account ID
-    mock_id = f"mock_acct_{user_id}_{int(datetime.utcnow().timestamp())}"
+    created = int(time.time())
+    mock_id = f"mock_acct_{user_id}_{created}"
     
     # Set initial test state
     account_state = update_test_account_state(mock_id, test_state)
-    # Store account in test accounts
-    test_accounts = db.storage.json.get('stripe_test_accounts', default={})
     
     account_data = {
         "id": mock_id,
@@ -250,11 +273,13 @@ def mock_create_connect_account(user_id: str, account_type: str, country: str, c
             }
         },
         "type": account_type,
-        "created": int(datetime.utcnow().timestamp())
+        "created": created
     }
     
-    # Store account data
-    test_accounts[mock_id] = account_data
-    db.storage.json.put('stripe_test_accounts', test_accounts)
+    # Store account data under its own key and record it in the ID index
+    put_storage_blob(get_test_account_key(mock_id), account_data)
+    test_account_ids = get_storage_blob('stripe_test_account_ids', default=[])
+    test_account_ids.append(mock_id)
+    put_storage_blob('stripe_test_account_ids', test_account_ids)
     
     return account_data
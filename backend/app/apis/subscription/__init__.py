@@ -1,24 +1,98 @@
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Dict, Any, TypedDict
+import asyncio
+import threading
+from pydantic import BaseModel, TypeAdapter
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse, Response
 import databutton as db
 from datetime import datetime, timedelta
 from uuid import uuid4
+from cachetools import TTLCache
 import stripe
 from app.apis.models import SubscriptionTier, FeatureAccess, UserSubscription
+from app.apis.utils import sanitize_key
 
 # Initialize Stripe
 stripe.api_key = db.secrets.get("STRIPE_SECRET_KEY")
 
 router = APIRouter()
 
+class UserSubscriptionRecord(TypedDict, total=False):
+    """Shape of a stored user_subscriptions entry
+    
+    Internal helpers work on these plain dicts straight from storage; a
+    UserSubscription model is only built at the API boundary.
+    """
+    user_id: str
+    tier: str
+    starts_at: str
+    ends_at: Optional[str]
+    start_date: str
+    end_date: Optional[str]
+    is_active: bool
+    auto_renew: bool
+    is_trial: bool
+    trial_period: float
+    trial_start_date: str
+    trial_end_date: str
+    trial_status: str
+    post_trial_plan: str
+    payment_status: str
+    features: Dict[str, str]
+
+# Recently served user subscriptions as (stored dict, validated response
+# payload); every path that writes a user's subscription drops their entry
+USER_SUBSCRIPTION_CACHE_TTL = 60  # seconds
+_user_subscription_cache = TTLCache(maxsize=1024, ttl=USER_SUBSCRIPTION_CACHE_TTL)
+
+# Parsed storage blobs, reused for a few seconds by read-only requests on this
+# worker. Paths that modify a blob read it fresh with read_storage_json so they
+# never write back a stale copy; put_storage_json drops the cached entry
+STORAGE_CACHE_TTL = 10  # seconds
+_storage_cache = TTLCache(maxsize=32, ttl=STORAGE_CACHE_TTL)
+_storage_cache_lock = threading.Lock()
+_MISSING = object()
+
+def get_storage_json(key: str, default: Any = None) -> Any:
+    """Read a JSON blob from storage through the short-lived in-process cache
+    
+    Only for read-only use: the value may be a few seconds old and is the
+    cached object itself, so it must not be modified. Read-modify-write paths
+    must use read_storage_json instead.
+    """
+    with _storage_cache_lock:
+        value = _storage_cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = db.storage.json.get(key, default=default)
+        with _storage_cache_lock:
+            _storage_cache[key] = value
+    return value
+
+def read_storage_json(key: str, default: Any = None) -> Any:
+    """Read a JSON blob straight from storage, bypassing the cache, before modifying it"""
+    return db.storage.json.get(key, default=default)
+
+def put_storage_json(key: str, value: Any) -> None:
+    """Write a JSON blob to storage and drop the cached copy"""
+    try:
+        db.storage.json.put(key, value)
+    finally:
+        invalidate_storage_json(key)
+
+def invalidate_storage_json(key: str) -> None:
+    """Drop a cached blob after it was written without put_storage_json"""
+    with _storage_cache_lock:
+        _storage_cache.pop(key, None)
+
+def invalidate_user_subscription(user_id: str) -> None:
+    """Drop a user's cached subscription after it has been written"""
+    _user_subscription_cache.pop(user_id, None)
+
 class SubscriptionFeature(BaseModel):
     """Definition of a feature and its access level per tier"""
     name: str
     description: str
     access_levels: Dict[SubscriptionTier, FeatureAccess]
-    
-    model_config = {"arbitrary_types_allowed": True}
 
 class SubscriptionPlan(BaseModel):
     """Subscription plan details"""
@@ -33,8 +107,6 @@ class SubscriptionPlan(BaseModel):
     profile_visibility_level: str
     support_level: str
     trial_periods_available: List[float] = [0.5, 3, 6, 9]  # Available trial periods in months (0.5 = 14 days)
-    
-    model_config = {"arbitrary_types_allowed": True}
 
 # Define the feature set
 SUBSCRIPTION_FEATURES = {
@@ -100,6 +172,19 @@ SUBSCRIPTION_FEATURES = {
     )
 }
 
+# Each tier's feature -> access map, shared by the plan definitions below
+_TIER_FEATURE_MAP = {
+    tier: {name: feature.access_levels[tier] for name, feature in SUBSCRIPTION_FEATURES.items()}
+    for tier in SubscriptionTier
+}
+
+# Access level for every (tier, feature) pair, so checks are a single lookup
+_ACCESS_MATRIX = {
+    (tier, name): access
+    for tier, features in _TIER_FEATURE_MAP.items()
+    for name, access in features.items()
+}
+
 # Define the subscription plans
 SUBSCRIPTION_PLANS = {
     SubscriptionTier.FREE: SubscriptionPlan(
@@ -108,10 +193,7 @@ SUBSCRIPTION_PLANS = {
         description='Basic access to essential features',
         price_monthly=0,
         price_annual=0,
-        features={
-            feature: data.access_levels[SubscriptionTier.FREE]
-            for feature, data in SUBSCRIPTION_FEATURES.items()
-        },
+        features=_TIER_FEATURE_MAP[SubscriptionTier.FREE],
         max_contacts=50,
         max_matches_per_month=20,
         profile_visibility_level='basic',
@@ -123,10 +205,7 @@ SUBSCRIPTION_PLANS = {
         description='Enhanced features for growing networks',
         price_monthly=49.99,
         price_annual=499.99,
-        features={
-            feature: data.access_levels[SubscriptionTier.BASIC]
-            for feature, data in SUBSCRIPTION_FEATURES.items()
-        },
+        features=_TIER_FEATURE_MAP[SubscriptionTier.BASIC],
         max_contacts=200,
         max_matches_per_month=100,
         profile_visibility_level='enhanced',
@@ -138,10 +217,7 @@ SUBSCRIPTION_PLANS = {
         description='Advanced features for professional networkers',
         price_monthly=99.99,
         price_annual=999.99,
-        features={
-            feature: data.access_levels[SubscriptionTier.PROFESSIONAL]
-            for feature, data in SUBSCRIPTION_FEATURES.items()
-        },
+        features=_TIER_FEATURE_MAP[SubscriptionTier.PROFESSIONAL],
         max_contacts=1000,
         max_matches_per_month=500,
         profile_visibility_level='full',
@@ -153,10 +229,7 @@ SUBSCRIPTION_PLANS = {
         description='Complete solution for large organizations',
         price_monthly=299.99,
         price_annual=2999.99,
-        features={
-            feature: data.access_levels[SubscriptionTier.ENTERPRISE]
-            for feature, data in SUBSCRIPTION_FEATURES.items()
-        },
+        features=_TIER_FEATURE_MAP[SubscriptionTier.ENTERPRISE],
         max_contacts=5000,
         max_matches_per_month=2000,
         profile_visibility_level='custom',
@@ -164,16 +237,18 @@ SUBSCRIPTION_PLANS = {
     )
 }
 
+# Trial length in days for the standard trial periods (in months); custom
+# codes with other periods fall back to 30 days per month
+_TRIAL_DAYS = {0.5: 14, 3: 90, 6: 180, 9: 270}
+
 class PaymentMethod(BaseModel):
     """Payment method details"""
     id: str
-    type: str  # 'credit_card', 'bank_account'
+    type: Literal['credit_card', 'bank_account']
     last_four: str
     expiry_date: Optional[str] = None  # For credit cards
     is_default: bool = False
     created_at: str  # ISO format date string
-    
-    model_config = {"arbitrary_types_allowed": True}
 
 class PaymentTransaction(BaseModel):
     """Payment transaction details"""
@@ -181,14 +256,13 @@ class PaymentTransaction(BaseModel):
     user_id: str
     amount: float
     currency: str = 'USD'
-    status: str  # 'pending', 'completed', 'failed'
+    status: Literal['pending', 'completed', 'failed']
     payment_method_id: str
     description: str
     created_at: str  # ISO format date string
     subscription_period_start: str  # ISO format date string
     subscription_period_end: str  # ISO format date string
-    
-    model_config = {"arbitrary_types_allowed": True}
+    stripe_payment_intent_id: Optional[str] = None
 
 class Invoice(BaseModel):
     """Invoice details"""
@@ -197,12 +271,10 @@ class Invoice(BaseModel):
     transaction_id: str
     amount: float
     currency: str = 'USD'
-    status: str  # 'pending', 'paid', 'overdue'
+    status: Literal['pending', 'paid', 'overdue']
     due_date: str  # ISO format date string
     items: List[Dict[str, Any]]
     created_at: str  # ISO format date string
-    
-    model_config = {"arbitrary_types_allowed": True}
 
 class TrialCode(BaseModel):
     """Trial code details"""
@@ -213,34 +285,59 @@ class TrialCode(BaseModel):
     max_uses: int
     current_uses: int = 0
     is_active: bool = True
-    
-    model_config = {"arbitrary_types_allowed": True}
 
 class StartTrialRequest(BaseModel):
     """Request to start a free trial"""
     user_id: str
     trial_code: str
-    
-    model_config = {"arbitrary_types_allowed": True}
 
 class SubscriptionUpdate(BaseModel):
     """Subscription update request"""
     new_tier: SubscriptionTier
     payment_method_id: str
     is_annual: bool = False
-    
-    model_config = {"arbitrary_types_allowed": True}
-
 
-
-@router.get('/subscription-plans', response_model=Dict[str, SubscriptionPlan])
+class StartTrialResponse(BaseModel):
+    """Result of starting a free trial"""
+    status: str
+    message: str
+    subscription: UserSubscription
+
+class SubscriptionUpdateResponse(BaseModel):
+    """Result of a paid subscription update"""
+    subscription: UserSubscription
+    transaction: PaymentTransaction
+    invoice: Invoice
+
+# The plan and feature catalogs never change at runtime, so serialize them
+# once and hand out the cached bytes
+_PLAN_MAP_ADAPTER = TypeAdapter(Dict[str, SubscriptionPlan])
+_FEATURE_MAP_ADAPTER = TypeAdapter(Dict[str, SubscriptionFeature])
+_SUBSCRIPTION_PLANS_JSON: bytes = _PLAN_MAP_ADAPTER.dump_json(
+    {tier.value: plan for tier, plan in SUBSCRIPTION_PLANS.items()}
+)
+_SUBSCRIPTION_FEATURES_JSON: bytes = _FEATURE_MAP_ADAPTER.dump_json(SUBSCRIPTION_FEATURES)
+
+# Let browsers and CDNs keep the catalogs for an hour and serve a stale copy
+# for up to a day while they refetch in the background
+_CATALOG_CACHE_HEADERS = {"Cache-Control": "public, max-age=3600, stale-while-revalidate=86400"}
+
+@router.get(
+    '/subscription-plans',
+    response_model=None,
+    responses={200: {"model": Dict[str, SubscriptionPlan]}}
+)
 async def get_subscription_plans():
     """Get all available subscription plans"""
-    return {tier.value: plan for tier, plan in SUBSCRIPTION_PLANS.items()}
+    return Response(content=_SUBSCRIPTION_PLANS_JSON, media_type="application/json", headers=_CATALOG_CACHE_HEADERS)
 
-def validate_trial_code(code: str) -> tuple[bool, Optional[TrialCode], str]:
-    """Validate if the trial code is valid and available"""
-    trial_codes = db.storage.json.get('trial_codes', default={})
+def validate_trial_code(code: str, trial_codes: Optional[Dict[str, Dict]] = None) -> tuple[bool, Optional[TrialCode], str]:
+    """Validate if the trial code is valid and available
+    
+    Pass an already loaded trial_codes dict to avoid reading it again.
+    """
+    if trial_codes is None:
+        trial_codes = get_storage_json('trial_codes', default={})
     trial_code = trial_codes.get(code)
     
     if not trial_code:
@@ -259,9 +356,13 @@ def validate_trial_code(code: str) -> tuple[bool, Optional[TrialCode], str]:
         
     return True, trial_code, ''
 
-def check_trial_eligibility(user_id: str) -> tuple[bool, str]:
-    """Check if a user is eligible for a trial"""
-    subscriptions = db.storage.json.get('user_subscriptions', default={})
+def check_trial_eligibility(user_id: str, subscriptions: Optional[Dict[str, UserSubscriptionRecord]] = None) -> tuple[bool, str]:
+    """Check if a user is eligible for a trial
+    
+    Pass an already loaded user_subscriptions dict to avoid reading it again.
+    """
+    if subscriptions is None:
+        subscriptions = get_storage_json('user_subscriptions', default={})
     user_subscription = subscriptions.get(user_id)
     
     if not user_subscription:
@@ -277,7 +378,7 @@ def check_trial_eligibility(user_id: str) -> tuple[bool, str]:
         
     return True, ''
 
-def check_trial_expiration(subscription: dict) -> bool:
+def check_trial_expiration(subscription: UserSubscriptionRecord) -> bool:
     """Check if a trial subscription has expired"""
     if not subscription.get('is_trial') or subscription.get('trial_status') != 'active':
         return False
@@ -285,12 +386,16 @@ def check_trial_expiration(subscription: dict) -> bool:
     trial_end = datetime.fromisoformat(subscription['trial_end_date'])
     return datetime.now() > trial_end
 
-@router.post('/start-trial', operation_id='start_trial')
+@router.post('/start-trial', operation_id='start_trial', response_model=StartTrialResponse)
 async def start_trial(request: StartTrialRequest):
     """Start a free trial subscription using a trial code"""
     try:
+        # Load each blob once; validation and the updates below share them
+        trial_codes = read_storage_json('trial_codes', default={})
+        subscriptions = read_storage_json('user_subscriptions', default={})
+        
         # Validate trial code
-        is_valid, trial_code, error_message = validate_trial_code(request.trial_code)
+        is_valid, trial_code, error_message = validate_trial_code(request.trial_code, trial_codes)
         if not is_valid:
             raise HTTPException(
                 status_code=400,
@@ -298,38 +403,34 @@ async def start_trial(request: StartTrialRequest):
             )
         
         # Check trial eligibility
-        is_eligible, message = check_trial_eligibility(request.user_id)
+        is_eligible, message = check_trial_eligibility(request.user_id, subscriptions)
         if not is_eligible:
             raise HTTPException(
                 status_code=400,
                 detail=message
             )
         
-        # Get or create subscription record
-        subscriptions = db.storage.json.get('user_subscriptions', default={})
-        
         # Calculate trial dates
         trial_start = datetime.now()
-        days = 14 if trial_code.trial_period == 0.5 else int(30 * trial_code.trial_period)
+        days = _TRIAL_DAYS.get(trial_code.trial_period) or int(30 * trial_code.trial_period)
         trial_end = trial_start + timedelta(days=days)
+        trial_start_iso = trial_start.isoformat()
+        trial_end_iso = trial_end.isoformat()
         
         # Update trial code usage
-        trial_codes = db.storage.json.get('trial_codes', default={})
-        trial_code_dict = trial_codes[request.trial_code]
-        trial_code_dict['current_uses'] += 1
-        trial_codes[request.trial_code] = trial_code_dict
-        db.storage.json.put('trial_codes', trial_codes)
+        trial_codes[request.trial_code]['current_uses'] += 1
+        put_storage_json('trial_codes', trial_codes)
         
         # Create trial subscription
         subscription = UserSubscription(
             user_id=request.user_id,
             tier=trial_code.tier,
-            start_date=trial_start.isoformat(),
-            end_date=trial_end.isoformat(),
+            start_date=trial_start_iso,
+            end_date=trial_end_iso,
             is_trial=True,
             trial_period=trial_code.trial_period,
-            trial_start_date=trial_start.isoformat(),
-            trial_end_date=trial_end.isoformat(),
+            trial_start_date=trial_start_iso,
+            trial_end_date=trial_end_iso,
             trial_status='active',
             post_trial_plan=trial_code.tier,
             auto_renew=True,
@@ -337,14 +438,15 @@ async def start_trial(request: StartTrialRequest):
         )
         
         # Save subscription
-        subscriptions[request.user_id] = subscription.model_dump()
-        db.storage.json.put('user_subscriptions', subscriptions)
-        
-        return {
-            'status': 'success',
-            'message': f'Trial started successfully. Trial ends on {trial_end.date()}',
-            'subscription': subscription
-        }
+        subscriptions[request.user_id] = subscription.model_dump(mode='json')
+        put_storage_json('user_subscriptions', subscriptions)
+        invalidate_user_subscription(request.user_id)
+        
+        return StartTrialResponse(
+            status='success',
+            message=f'Trial started successfully. Trial ends on {trial_end.date()}',
+            subscription=subscription
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -353,18 +455,35 @@ async def start_trial(request: StartTrialRequest):
             detail=f'Error starting trial: {str(e)}'
         ) from e
 
-@router.get('/subscription-features', response_model=Dict[str, SubscriptionFeature])
+@router.get(
+    '/subscription-features',
+    response_model=None,
+    responses={200: {"model": Dict[str, SubscriptionFeature]}}
+)
 async def get_subscription_features():
     """Get all subscription features and their access levels"""
-    return SUBSCRIPTION_FEATURES
+    return Response(content=_SUBSCRIPTION_FEATURES_JSON, media_type="application/json", headers=_CATALOG_CACHE_HEADERS)
 
-@router.get('/user-subscription/{user_id}', response_model=UserSubscription)
+@router.get(
+    '/user-subscription/{user_id}',
+    response_model=None,
+    responses={200: {"model": UserSubscription}}
+)
 async def get_user_subscription(user_id: str):
     """Get subscription details for a user"""
     try:
-        subscriptions = db.storage.json.get('user_subscriptions', default={})
+        cached = _user_subscription_cache.get(user_id)
+        if cached is not None and not check_trial_expiration(cached[0]):
+            return ORJSONResponse(cached[1])
+        
+        subscriptions = get_storage_json('user_subscriptions', default={})
         subscription = subscriptions.get(user_id)
         
+        if not subscription or check_trial_expiration(subscription):
+            # This request writes the subscription, so start from the stored blob
+            subscriptions = read_storage_json('user_subscriptions', default={})
+            subscription = subscriptions.get(user_id)
+        
         if not subscription:
             # Create a free tier subscription for new users
             subscription = UserSubscription(
@@ -373,9 +492,10 @@ async def get_user_subscription(user_id: str):
                 start_date=datetime.now().isoformat(),
                 is_trial=False
             )
-            subscriptions[user_id] = subscription.model_dump()
-            db.storage.json.put('user_subscriptions', subscriptions)
-            return subscription
+            subscriptions[user_id] = subscription.model_dump(mode='json')
+            put_storage_json('user_subscriptions', subscriptions)
+            _user_subscription_cache[user_id] = (subscriptions[user_id], subscriptions[user_id])
+            return ORJSONResponse(subscriptions[user_id])
         
         # Check for trial expiration
         if check_trial_expiration(subscription):
@@ -390,14 +510,19 @@ async def get_user_subscription(user_id: str):
             
             # Save updated subscription
             subscriptions[user_id] = subscription
-            db.storage.json.put('user_subscriptions', subscriptions)
+            put_storage_json('user_subscriptions', subscriptions)
+            invalidate_user_subscription(user_id)
             
             # If converting to a paid plan, we should notify the user
             if post_trial_plan != SubscriptionTier.FREE:
                 print(f'[INFO] Trial expired for user {user_id}. Converting to {post_trial_plan} plan.')
                 # Here we could trigger a notification to the user
         
-        return UserSubscription(**subscription if isinstance(subscription, dict) else subscription.model_dump())
+        # Validated once per cache fill; the response then skips FastAPI's
+        # response_model pass
+        payload = UserSubscription(**subscription).model_dump(mode='json')
+        _user_subscription_cache[user_id] = (subscription, payload)
+        return ORJSONResponse(payload)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -406,46 +531,84 @@ async def get_user_subscription(user_id: str):
 
 def check_feature_access(user_id: str, feature_name: str) -> FeatureAccess:
     """Check a user's access level for a specific feature"""
+    return check_features_access(user_id, [feature_name])[feature_name]
+
+def check_features_access(user_id: str, feature_names: List[str]) -> Dict[str, FeatureAccess]:
+    """Check a user's access level for several features with one subscription read"""
     try:
-        subscriptions = db.storage.json.get('user_subscriptions', default={})
+        subscriptions = get_storage_json('user_subscriptions', default={})
         subscription = subscriptions.get(user_id)
         
         if not subscription:
-            return FeatureAccess.NONE
-            
-        user_tier = subscription['tier']
-        feature = SUBSCRIPTION_FEATURES.get(feature_name)
+            return {name: FeatureAccess.NONE for name in feature_names}
         
-        if not feature:
-            return FeatureAccess.NONE
-            
-        return feature.access_levels[user_tier]
+        tier = subscription['tier']
+        return {name: _ACCESS_MATRIX.get((tier, name), FeatureAccess.NONE) for name in feature_names}
     except Exception:
-        return FeatureAccess.NONE
+        return {name: FeatureAccess.NONE for name in feature_names}
+
+def get_user_transactions_index_key(user_id: str) -> str:
+    """Get the storage key for a user's transaction ID index"""
+    return sanitize_key(f"transactions_by_user.{user_id}")
+
+def get_user_invoices_index_key(user_id: str) -> str:
+    """Get the storage key for a user's invoice ID index"""
+    return sanitize_key(f"invoices_by_user.{user_id}")
 
-def create_payment_transaction(user_id: str, amount: float, payment_method_id: str, description: str, period_start: datetime, period_end: datetime) -> PaymentTransaction:
-    """Create a new payment transaction"""
+def get_user_record_ids(index_key: str, records: Dict[str, Dict], user_id: str) -> List[str]:
+    """Get a user's record IDs from their index, building it from records if missing
+    
+    Records created before the per-user indexes existed are picked up by the
+    one-off scan, after which the index is kept current on every create.
+    """
+    record_ids = get_storage_json(index_key, default=None)
+    if record_ids is None:
+        record_ids = read_storage_json(index_key, default=None)
+    if record_ids is None:
+        record_ids = [record_id for record_id, record in records.items() if record['user_id'] == user_id]
+        put_storage_json(index_key, record_ids)
+    return record_ids
+
+def add_user_record_id(index_key: str, records: Dict[str, Dict], user_id: str, record_id: str) -> None:
+    """Record a newly stored record's ID in the user's index"""
+    record_ids = read_storage_json(index_key, default=None)
+    if record_ids is None:
+        # records already holds the new entry, so the scan includes it
+        record_ids = [rid for rid, record in records.items() if record['user_id'] == user_id]
+    else:
+        record_ids.append(record_id)
+    put_storage_json(index_key, record_ids)
+
+def create_payment_transaction(user_id: str, amount: float, payment_method_id: str, description: str, period_start: datetime, period_end: datetime, status: str = 'pending', stripe_payment_intent_id: Optional[str] = None) -> PaymentTransaction:
+    """Create a new payment transaction
+    
+    Pass the final status and Stripe payment intent when the payment has
+    already been confirmed, so the record is written once.
+    """
     transaction = PaymentTransaction(
         id=str(uuid4()),
         user_id=user_id,
         amount=amount,
         payment_method_id=payment_method_id,
-        status='pending',
+        status=status,
         description=description,
         created_at=datetime.now().isoformat(),
         subscription_period_start=period_start.isoformat(),
-        subscription_period_end=period_end.isoformat()
+        subscription_period_end=period_end.isoformat(),
+        stripe_payment_intent_id=stripe_payment_intent_id
     )
     
     # Store transaction
-    transactions = db.storage.json.get('payment_transactions', default={})
-    transactions[transaction.id] = transaction.model_dump()
-    db.storage.json.put('payment_transactions', transactions)
+    transactions = read_storage_json('payment_transactions', default={})
+    transactions[transaction.id] = transaction.model_dump(mode='json')
+    put_storage_json('payment_transactions', transactions)
+    add_user_record_id(get_user_transactions_index_key(user_id), transactions, user_id, transaction.id)
     
     return transaction
 
 def create_invoice(transaction: PaymentTransaction, items: List[Dict[str, any]]) -> Invoice:
     """Create a new invoice for a transaction"""
+    now = datetime.now()
     invoice = Invoice(
         id=str(uuid4()),
         user_id=transaction.user_id,
@@ -453,20 +616,21 @@ def create_invoice(transaction: PaymentTransaction, items: List[Dict[str, any]])
         amount=transaction.amount,
         currency=transaction.currency,
         status='pending',
-        due_date=(datetime.now() + timedelta(days=30)).isoformat(),
+        due_date=(now + timedelta(days=30)).isoformat(),
         items=items,
-        created_at=datetime.now().isoformat()
+        created_at=now.isoformat()
     )
     
     # Store invoice
-    invoices = db.storage.json.get('invoices', default={})
-    invoices[invoice.id] = invoice.model_dump()
-    db.storage.json.put('invoices', invoices)
+    invoices = read_storage_json('invoices', default={})
+    invoices[invoice.id] = invoice.model_dump(mode='json')
+    put_storage_json('invoices', invoices)
+    add_user_record_id(get_user_invoices_index_key(invoice.user_id), invoices, invoice.user_id, invoice.id)
     
     return invoice
 
 @router.post('/payment-methods/{user_id}')
-async def add_payment_method(user_id: str, payment_type: str, last_four: str, expiry_date: Optional[str] = None):
+async def add_payment_method(user_id: str, payment_type: Literal['credit_card', 'bank_account'], last_four: str, expiry_date: Optional[str] = None):
     """Add a new payment method for a user"""
     try:
         payment_method = PaymentMethod(
@@ -478,16 +642,16 @@ async def add_payment_method(user_id: str, payment_type: str, last_four: str, ex
         )
         
         # Store payment method
-        payment_methods = db.storage.json.get('payment_methods', default={})
+        payment_methods = read_storage_json('payment_methods', default={})
         user_methods = payment_methods.get(user_id, [])
         
         # Set as default if it's the first payment method
         if not user_methods:
             payment_method.is_default = True
             
-        user_methods.append(payment_method.model_dump())
+        user_methods.append(payment_method.model_dump(mode='json'))
         payment_methods[user_id] = user_methods
-        db.storage.json.put('payment_methods', payment_methods)
+        put_storage_json('payment_methods', payment_methods)
         
         return payment_method
     except Exception as e:
@@ -497,18 +661,20 @@ async def add_payment_method(user_id: str, payment_type: str, last_four: str, ex
 async def get_payment_methods(user_id: str):
     """Get all payment methods for a user"""
     try:
-        payment_methods = db.storage.json.get('payment_methods', default={})
+        payment_methods = get_storage_json('payment_methods', default={})
         return payment_methods.get(user_id, [])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post('/subscriptions/{user_id}/update')
+@router.post('/subscriptions/{user_id}/update', response_model=SubscriptionUpdateResponse)
 async def update_subscription(user_id: str, update: SubscriptionUpdate):
     """Update a user's subscription using Stripe for payment processing"""
     """Update a user's subscription"""
     try:
+        # Storage and Stripe calls are blocking, so each runs in a worker thread
+        # to keep the event loop free while they wait on the network.
         # Get current subscription
-        subscriptions = db.storage.json.get('user_subscriptions', default={})
+        subscriptions = await asyncio.to_thread(read_storage_json, 'user_subscriptions', default={})
         current_subscription = subscriptions.get(user_id)
         
         if not current_subscription:
@@ -521,7 +687,8 @@ async def update_subscription(user_id: str, update: SubscriptionUpdate):
         
         # Create Stripe payment intent
         try:
-            payment_intent = stripe.PaymentIntent.create(
+            payment_intent = await asyncio.to_thread(
+                stripe.PaymentIntent.create,
                 amount=int(price * 100),  # Convert to cents
                 currency='usd',
                 customer=user_id,  # Assuming user_id is the Stripe customer ID
@@ -539,24 +706,22 @@ async def update_subscription(user_id: str, update: SubscriptionUpdate):
             # Create internal transaction record
             period_start = datetime.now()
             period_end = period_start + timedelta(days=30*period_months)
+            period_start_iso = period_start.isoformat()
+            period_end_iso = period_end.isoformat()
             
-            transaction = create_payment_transaction(
+            transaction = await asyncio.to_thread(
+                create_payment_transaction,
                 user_id=user_id,
                 amount=price,
                 payment_method_id=update.payment_method_id,
                 description=f'{new_plan.name} Subscription - {"Annual" if update.is_annual else "Monthly"}',
                 period_start=period_start,
-                period_end=period_end
+                period_end=period_end,
+                # Stripe has already confirmed the payment
+                status='completed',
+                stripe_payment_intent_id=payment_intent.id
             )
             
-            # Update transaction status based on Stripe payment
-            transactions = db.storage.json.get('payment_transactions', default={})
-            transaction_dict = transactions[transaction.id]
-            transaction_dict['status'] = 'completed'
-            transaction_dict['stripe_payment_intent_id'] = payment_intent.id
-            transactions[transaction.id] = transaction_dict
-            db.storage.json.put('payment_transactions', transactions)
-            
         except stripe.error.CardError as e:
             # Handle failed payment
             raise HTTPException(
@@ -575,58 +740,65 @@ async def update_subscription(user_id: str, update: SubscriptionUpdate):
             'period': f'{period_start.date()} to {period_end.date()}',
             'amount': price
         }]
-        invoice = create_invoice(transaction, items)
+        invoice = await asyncio.to_thread(create_invoice, transaction, items)
         
         # Update subscription
         subscription = UserSubscription(
             user_id=user_id,
             tier=update.new_tier,
-            start_date=period_start.isoformat(),
-            end_date=period_end.isoformat(),
+            start_date=period_start_iso,
+            end_date=period_end_iso,
             is_trial=False,
             auto_renew=True,
             payment_status='active',
-            last_payment_date=period_start.isoformat(),
-            next_payment_date=period_end.isoformat()
+            last_payment_date=period_start_iso,
+            next_payment_date=period_end_iso
         )
         
-        subscriptions[user_id] = subscription.dict()
-        db.storage.json.put('user_subscriptions', subscriptions)
+        subscriptions[user_id] = subscription.model_dump(mode='json')
+        await asyncio.to_thread(put_storage_json, 'user_subscriptions', subscriptions)
+        invalidate_user_subscription(user_id)
         
-        return {
-            'subscription': subscription,
-            'transaction': transaction,
-            'invoice': invoice
-        }
+        return SubscriptionUpdateResponse(
+            subscription=subscription,
+            transaction=transaction,
+            invoice=invoice
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get('/transactions/{user_id}')
+@router.get('/transactions/{user_id}', response_class=ORJSONResponse)
 async def get_transactions(user_id: str):
     """Get payment transaction history for a user"""
     try:
-        transactions = db.storage.json.get('payment_transactions', default={})
+        transactions = get_storage_json('payment_transactions', default={})
         user_transactions = [
-            trans for trans in transactions.values()
-            if trans['user_id'] == user_id
+            transactions[transaction_id]
+            for transaction_id in get_user_record_ids(get_user_transactions_index_key(user_id), transactions, user_id)
+            if transaction_id in transactions
         ]
-        return sorted(user_transactions, key=lambda x: x['created_at'], reverse=True)
+        return ORJSONResponse(sorted(user_transactions, key=lambda x: x['created_at'], reverse=True))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get('/invoices/{user_id}')
+@router.get('/invoices/{user_id}', response_class=ORJSONResponse)
 async def get_invoices(user_id: str):
     """Get invoice history for a user"""
     try:
-        invoices = db.storage.json.get('invoices', default={})
+        invoices = get_storage_json('invoices', default={})
         user_invoices = [
-            inv for inv in invoices.values()
-            if inv['user_id'] == user_id
+            invoices[invoice_id]
+            for invoice_id in get_user_record_ids(get_user_invoices_index_key(user_id), invoices, user_id)
+            if invoice_id in invoices
         ]
-        return sorted(user_invoices, key=lambda x: x['created_at'], reverse=True)
+        return ORJSONResponse(sorted(user_invoices, key=lambda x: x['created_at'], reverse=True))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class FeatureAccessBatchRequest(BaseModel):
+    """Request to check access to several features at once"""
+    features: List[str]
+
 class CreateTrialCodeRequest(BaseModel):
     """Request to create a trial code"""
     trial_period: float  # Trial period in months
@@ -634,14 +806,12 @@ class CreateTrialCodeRequest(BaseModel):
     expiry_date: str  # ISO format date string
     max_uses: int
     code: Optional[str] = None  # Optional custom code
-    
-    model_config = {"arbitrary_types_allowed": True}
 
 @router.post('/admin/trial-codes')
 async def create_trial_code(request: CreateTrialCodeRequest):
     """Create a new trial code (admin only)"""
     try:
-        trial_codes = db.storage.json.get('trial_codes', default={})
+        trial_codes = read_storage_json('trial_codes', default={})
         
         # Generate a unique code if not provided
         code = request.code or str(uuid4())[:8].upper()
@@ -663,8 +833,8 @@ async def create_trial_code(request: CreateTrialCodeRequest):
         )
         
         # Save trial code
-        trial_codes[code] = trial_code.model_dump()
-        db.storage.json.put('trial_codes', trial_codes)
+        trial_codes[code] = trial_code.model_dump(mode='json')
+        put_storage_json('trial_codes', trial_codes)
         
         return trial_code
     except HTTPException:
@@ -679,7 +849,7 @@ async def create_trial_code(request: CreateTrialCodeRequest):
 async def list_trial_codes():
     """List all trial codes (admin only)"""
     try:
-        trial_codes = db.storage.json.get('trial_codes', default={})
+        trial_codes = get_storage_json('trial_codes', default={})
         return list(trial_codes.values())
     except Exception as e:
         raise HTTPException(
@@ -691,7 +861,7 @@ async def list_trial_codes():
 async def deactivate_trial_code(code: str):
     """Deactivate a trial code (admin only)"""
     try:
-        trial_codes = db.storage.json.get('trial_codes', default={})
+        trial_codes = read_storage_json('trial_codes', default={})
         
         if code not in trial_codes:
             raise HTTPException(
@@ -700,7 +870,7 @@ async def deactivate_trial_code(code: str):
             )
         
         trial_codes[code]['is_active'] = False
-        db.storage.json.put('trial_codes', trial_codes)
+        put_storage_json('trial_codes', trial_codes)
         
         return {'status': 'success', 'message': 'Trial code deactivated'}
     except HTTPException:
@@ -720,3 +890,17 @@ async def get_feature_access(user_id: str, feature_name: str):
         'access_level': access_level,
         'has_access': access_level != FeatureAccess.NONE
     }
+
+@router.post('/check-feature-access/{user_id}')
+async def get_features_access(user_id: str, request: FeatureAccessBatchRequest):
+    """Check a user's access to several features in one call"""
+    access_levels = check_features_access(user_id, request.features)
+    return {
+        'features': {
+            feature: {
+                'access_level': access_level,
+                'has_access': access_level != FeatureAccess.NONE
+            }
+            for feature, access_level in access_levels.items()
+        }
+    }
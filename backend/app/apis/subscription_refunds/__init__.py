@@ -1,23 +1,53 @@
+import asyncio
+import time
+import uuid
 from typing import List, Optional
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
 from datetime import datetime, timezone
 import databutton as db
 from app.apis.models import RefundRequest, RefundResponse, CancellationRequest, CancellationResponse
+from app.apis.subscription import invalidate_storage_json, invalidate_user_subscription
+from app.apis.utils import sanitize_key
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+
+def get_refund_key(refund_id: str) -> str:
+    """Get the storage key for a single refund record"""
+    return sanitize_key(f"refund.{refund_id}")
+
+def get_cancellation_key(cancellation_id: str) -> str:
+    """Get the storage key for a single cancellation record"""
+    return sanitize_key(f"cancellation.{cancellation_id}")
+
+def get_record(key: str, legacy_blob: str, record_id: str) -> Optional[dict]:
+    """Read one record from its own key, falling back to the legacy shared blob"""
+    record = db.storage.json.get(key, default=None)
+    if record is None:
+        record = db.storage.json.get(legacy_blob, default={}).get(record_id)
+    return record
+
+SECONDS_PER_DAY = 86400
+
+def iso_to_epoch(value: str) -> float:
+    """Convert a stored ISO date to epoch seconds, reading naive dates as UTC"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        # timestamp() would otherwise use the server's local time zone
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
 
 def calculate_prorated_refund(subscription_data: dict) -> float:
     """Calculate the prorated refund amount based on unused subscription time"""
-    # Get the end date of the subscription period
-    end_date = datetime.fromisoformat(subscription_data['end_date'])
-    current_date = datetime.now(timezone.utc)
+    # Work in epoch seconds; floor division matches timedelta.days
+    start_ts = iso_to_epoch(subscription_data['start_date'])
+    end_ts = iso_to_epoch(subscription_data['end_date'])
     
     # Calculate total days in subscription period
-    start_date = datetime.fromisoformat(subscription_data['start_date'])
-    total_days = (end_date - start_date).days
+    total_days = int((end_ts - start_ts) // SECONDS_PER_DAY)
     
     # Calculate unused days
-    unused_days = (end_date - current_date).days
+    unused_days = int((end_ts - time.time()) // SECONDS_PER_DAY)
     
     # Calculate prorated refund
     if total_days <= 0 or unused_days <= 0:
@@ -28,55 +58,59 @@ def calculate_prorated_refund(subscription_data: dict) -> float:
     
     return round(prorated_refund, 2)
 
-@router.post("/request-refund", response_model=RefundResponse)
-def request_refund(request: RefundRequest) -> RefundResponse:
+def build_refund_record(subscription_id: str, user_id: str, amount: float, reason: str, request_date: str) -> dict:
+    """Build the stored record for a new, pending refund request under a fresh ID"""
+    return {
+        "refund_id": f"ref_{uuid.uuid4().hex}",
+        "subscription_id": subscription_id,
+        "user_id": user_id,
+        "amount": amount,
+        "reason": reason,
+        "request_date": request_date,
+        "status": "pending",
+        "processing_date": None,
+        "notes": None
+    }
+
+@router.post("/request-refund", response_model=None, responses={200: {"model": RefundResponse}})
+def request_refund(request: RefundRequest) -> ORJSONResponse:
     """Request a refund for a subscription payment"""
     try:
-        # Load existing refunds
-        refunds = db.storage.json.get("refunds", default={})
+        # Create refund record; RefundRequest carries no date, so stamp it here
+        refund_record = build_refund_record(
+            request.subscription_id,
+            request.user_id,
+            request.amount,
+            request.reason,
+            datetime.now(timezone.utc).isoformat()
+        )
+        refund_id = refund_record["refund_id"]
         
-        # Generate a unique refund ID
-        refund_id = f"ref_{datetime.now().strftime('%Y%m%d%H%M%S')}_{request.user_id}"
+        # Store the refund request
+        db.storage.json.put(get_refund_key(refund_id), refund_record)
         
-        # Create refund record
-        refund_record = {
+        return ORJSONResponse({
             "refund_id": refund_id,
-            "subscription_id": request.subscription_id,
-            "user_id": request.user_id,
-            "amount": request.amount,
-            "reason": request.reason,
-            "request_date": request.request_date,
             "status": "pending",
-            "processing_date": None,
-            "notes": None
-        }
-        
-        # Store the refund request
-        refunds[refund_id] = refund_record
-        db.storage.json.put("refunds", refunds)
-        
-        return RefundResponse(
-            refund_id=refund_id,
-            status="pending",
-            amount=request.amount
-        )
+            "amount": request.amount
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing refund request: {str(e)}") from e
 
 @router.post("/cancel-subscription", response_model=CancellationResponse)
-def cancel_subscription(request: CancellationRequest) -> CancellationResponse:
+async def cancel_subscription(request: CancellationRequest) -> CancellationResponse:
     """Cancel a subscription with optional immediate cancellation"""
     try:
         # Load subscriptions
-        subscriptions = db.storage.json.get("user_subscriptions", default={})
+        subscriptions = await asyncio.to_thread(db.storage.json.get, "user_subscriptions", default={})
         subscription = subscriptions.get(request.subscription_id)
         
         if not subscription:
             raise HTTPException(status_code=404, detail="Subscription not found")
         
         # Generate cancellation ID
-        cancellation_id = f"can_{datetime.now().strftime('%Y%m%d%H%M%S')}_{request.user_id}"
+        cancellation_id = f"can_{uuid.uuid4().hex}"
         
         # Calculate effective date and prorated refund
         current_date = datetime.now(timezone.utc)
@@ -93,11 +127,7 @@ def cancel_subscription(request: CancellationRequest) -> CancellationResponse:
         subscription['cancellation_reason'] = request.reason
         subscriptions[request.subscription_id] = subscription
         
-        # Store updated subscription data
-        db.storage.json.put("user_subscriptions", subscriptions)
-        
         # Create cancellation record
-        cancellations = db.storage.json.get("cancellations", default={})
         cancellation_record = {
             "cancellation_id": cancellation_id,
             "subscription_id": request.subscription_id,
@@ -110,19 +140,33 @@ def cancel_subscription(request: CancellationRequest) -> CancellationResponse:
             "status": "processed"
         }
         
-        cancellations[cancellation_id] = cancellation_record
-        db.storage.json.put("cancellations", cancellations)
-        
         # If there's a prorated refund, create a refund request
+        refund_record = None
         if prorated_refund > 0:
-            refund_request = RefundRequest(
-                subscription_id=request.subscription_id,
-                user_id=request.user_id,
-                amount=prorated_refund,
-                reason=f"Prorated refund for immediate cancellation of subscription {request.subscription_id}",
-                request_date=current_date.isoformat()
+            refund_record = build_refund_record(
+                request.subscription_id,
+                request.user_id,
+                prorated_refund,
+                f"Prorated refund for immediate cancellation of subscription {request.subscription_id}",
+                current_date.isoformat()
             )
-            request_refund(refund_request)
+        
+        # The subscription, cancellation and refund records live under separate
+        # keys, so write them concurrently
+        writes = [
+            asyncio.to_thread(db.storage.json.put, "user_subscriptions", subscriptions),
+            asyncio.to_thread(db.storage.json.put, get_cancellation_key(cancellation_id), cancellation_record),
+        ]
+        if refund_record is not None:
+            writes.append(asyncio.to_thread(
+                db.storage.json.put, get_refund_key(refund_record["refund_id"]), refund_record
+            ))
+        
+        try:
+            await asyncio.gather(*writes)
+        finally:
+            invalidate_storage_json("user_subscriptions")
+            invalidate_user_subscription(request.subscription_id)
         
         return CancellationResponse(
             cancellation_id=cancellation_id,
@@ -137,46 +181,44 @@ def cancel_subscription(request: CancellationRequest) -> CancellationResponse:
             raise e
         raise HTTPException(status_code=500, detail=f"Error processing cancellation request: {str(e)}") from e
 
-@router.get("/refund-status/{refund_id}", response_model=RefundResponse)
-def get_refund_status(refund_id: str) -> RefundResponse:
+@router.get("/refund-status/{refund_id}", response_model=None, responses={200: {"model": RefundResponse}})
+def get_refund_status(refund_id: str) -> ORJSONResponse:
     """Get the status of a refund request"""
     try:
-        refunds = db.storage.json.get("refunds", default={})
-        refund = refunds.get(refund_id)
+        refund = get_record(get_refund_key(refund_id), "refunds", refund_id)
         
         if not refund:
             raise HTTPException(status_code=404, detail="Refund request not found")
         
-        return RefundResponse(
-            refund_id=refund['refund_id'],
-            status=refund['status'],
-            amount=refund['amount'],
-            processing_date=refund['processing_date'],
-            notes=refund['notes']
-        )
+        return ORJSONResponse({
+            "refund_id": refund['refund_id'],
+            "status": refund['status'],
+            "amount": refund['amount'],
+            "processing_date": refund['processing_date'],
+            "notes": refund['notes']
+        })
         
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=f"Error getting refund status: {str(e)}") from e
 
-@router.get("/cancellation-status/{cancellation_id}", response_model=CancellationResponse)
-def get_cancellation_status(cancellation_id: str) -> CancellationResponse:
+@router.get("/cancellation-status/{cancellation_id}", response_model=None, responses={200: {"model": CancellationResponse}})
+def get_cancellation_status(cancellation_id: str) -> ORJSONResponse:
     """Get the status of a cancellation request"""
     try:
-        cancellations = db.storage.json.get("cancellations", default={})
-        cancellation = cancellations.get(cancellation_id)
+        cancellation = get_record(get_cancellation_key(cancellation_id), "cancellations", cancellation_id)
         
         if not cancellation:
             raise HTTPException(status_code=404, detail="Cancellation request not found")
         
-        return CancellationResponse(
-            cancellation_id=cancellation['cancellation_id'],
-            status=cancellation['status'],
-            effective_date=cancellation['effective_date'],
-            prorated_refund=cancellation.get('prorated_refund'),
-            notes=cancellation.get('notes')
-        )
+        return ORJSONResponse({
+            "cancellation_id": cancellation['cancellation_id'],
+            "status": cancellation['status'],
+            "effective_date": cancellation['effective_date'],
+            "prorated_refund": cancellation.get('prorated_refund'),
+            "notes": cancellation.get('notes')
+        })
         
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -1,16 +1,31 @@
-from typing import List, Optional, Dict, Any
+import asyncio
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from enum import Enum
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel, Field
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, TypeAdapter
+from cachetools import TTLCache
 from firebase_admin import auth
 import databutton as db
 import json
 import re
+import threading
+import uuid
+from urllib.parse import quote
 import requests
 
 API_URL = "http://localhost:8000/api"
 
+# Pooled session so knowledge base searches reuse connections to the API
+_kb_session = requests.Session()
+KB_SEARCH_TIMEOUT = 2.0  # seconds
+
+# Suggested articles per search query; ticket titles and descriptions repeat
+KB_SEARCH_CACHE_TTL = 300  # seconds
+_kb_search_cache = TTLCache(maxsize=256, ttl=KB_SEARCH_CACHE_TTL)
+_kb_search_cache_lock = threading.Lock()
+
 def get_current_user(authorization: str) -> Dict[str, Any]:
     """Get the current user from Firebase token"""
     if not authorization or not authorization.startswith('Bearer '):
@@ -30,11 +45,13 @@ def is_admin(user: Dict[str, Any]) -> bool:
     except Exception:
         return False
 
-router = APIRouter(prefix="/support", tags=["support"])
+router = APIRouter(prefix="/support", tags=["support"], default_response_class=ORJSONResponse)
+
+_UNSAFE_KEY_CHARS = re.compile(r'[^a-zA-Z0-9._-]+')
 
 def sanitize_storage_key(key: str) -> str:
     """Sanitize storage key to only allow alphanumeric and ._- symbols"""
-    return re.sub(r'[^a-zA-Z0-9._-]', '', key)
+    return _UNSAFE_KEY_CHARS.sub('', key)
 
 class TicketPriority(str, Enum):
     low = "low"
@@ -119,6 +136,16 @@ class HowToGuide(BaseModel):
     updated_at: datetime
     author_id: str
 
+# Dumps the whole ticket list in one serializer call on save
+_TICKET_LIST_ADAPTER = TypeAdapter(List[Ticket])
+
+# Parsed tickets with their id -> position and user -> positions indexes,
+# reused for a few seconds by read-only requests on this worker; write paths
+# read fresh with read_tickets and save_tickets drops the cached copy
+TICKET_CACHE_TTL = 10  # seconds
+_ticket_cache = TTLCache(maxsize=1, ttl=TICKET_CACHE_TTL)
+_ticket_cache_lock = threading.Lock()
+
 def initialize_storage():
     """Initialize storage with empty data if not exists"""
     try:
@@ -128,43 +155,96 @@ def initialize_storage():
         print(f"Error initializing storage: {err}")
         raise HTTPException(status_code=500, detail="Failed to initialize storage") from err
 
-def get_tickets() -> List[Ticket]:
-    """Get all tickets from storage"""
+def index_tickets(tickets: List[Ticket]) -> Tuple[Dict[str, int], Dict[str, List[int]]]:
+    """Index the ticket list by id (first position) and by owning user"""
+    index: Dict[str, int] = {}
+    by_user: Dict[str, List[int]] = {}
+    for i, ticket in enumerate(tickets):
+        index.setdefault(ticket.id, i)
+        by_user.setdefault(ticket.user_id, []).append(i)
+    return index, by_user
+
+def cache_tickets(tickets: List[Ticket]) -> Tuple[List[Ticket], Dict[str, int], Dict[str, List[int]]]:
+    """Index a ticket list and store it as the cached copy"""
+    entry = (tickets, *index_tickets(tickets))
+    with _ticket_cache_lock:
+        _ticket_cache['tickets'] = entry
+    return entry
+
+def read_tickets() -> List[Ticket]:
+    """Read all tickets straight from storage, bypassing the cache, before modifying them"""
+    initialize_storage()
+    tickets = db.storage.json.get('tickets', default=[])
+    # Tickets were validated when they were created and are only ever written
+    # back by save_tickets, so skip re-validating them on every read
+    return [Ticket.model_construct(**ticket) for ticket in tickets]
+
+def load_tickets() -> Tuple[List[Ticket], Dict[str, int], Dict[str, List[int]]]:
+    """Get the cached tickets and indexes, reading storage when they expired
+    
+    Everything returned is shared with the cache and must not be modified.
+    """
+    with _ticket_cache_lock:
+        cached = _ticket_cache.get('tickets')
+    if cached is not None:
+        return cached
     try:
-        initialize_storage()
-        tickets = db.storage.json.get('tickets', default=[])
-        return [Ticket(**ticket) for ticket in tickets]
+        return cache_tickets(read_tickets())
     except Exception as err:
         print(f"Error getting tickets: {err}")
         # Return empty list for get operations instead of raising
-        return []
+        return [], {}, {}
+
+def get_indexed_tickets() -> Tuple[List[Ticket], Dict[str, int]]:
+    """Get all tickets plus an id -> position index for O(1) lookups (read-only)"""
+    tickets, index, _ = load_tickets()
+    return tickets, index
+
+def read_indexed_tickets() -> Tuple[List[Ticket], Dict[str, int]]:
+    """Read all tickets fresh plus an id -> position index, for handlers that save them back"""
+    try:
+        tickets = read_tickets()
+    except Exception as err:
+        # Saving an empty list here would wipe every stored ticket
+        print(f"Error getting tickets: {err}")
+        raise HTTPException(status_code=500, detail="Failed to load ticket data") from err
+    index, _ = index_tickets(tickets)
+    return tickets, index
+
+def get_user_tickets(user_id: str) -> List[Ticket]:
+    """Get one user's tickets without scanning everyone else's"""
+    tickets, _, by_user = load_tickets()
+    return [tickets[i] for i in by_user.get(user_id, ())]
 
 def save_tickets(tickets: List[Ticket]):
     """Save tickets to storage"""
     try:
-        # Use model_dump instead of dict() for Pydantic v2
-        db.storage.json.put('tickets', [ticket.model_dump() for ticket in tickets])
+        # Constructed tickets keep stored values as-is (ISO strings, plain dicts)
+        db.storage.json.put('tickets', _TICKET_LIST_ADAPTER.dump_python(tickets, mode='json', warnings=False))
     except Exception as err:
         print(f"Error saving tickets: {err}")
         raise HTTPException(
             status_code=500, 
             detail="Failed to save ticket data"
         ) from err
+    finally:
+        with _ticket_cache_lock:
+            _ticket_cache.clear()
 
 class TicketWithSuggestions(BaseModel):
     ticket: Ticket
     suggested_articles: List[KnowledgeBaseArticle]
 
 @router.post("/tickets")
-def create_ticket(request: TicketRequest, current_user: Dict[str, Any]) -> TicketWithSuggestions:
+async def create_ticket(request: TicketRequest, current_user: Dict[str, Any]) -> TicketWithSuggestions:
     """Create a new support ticket"""
     user_id = current_user['uid']
 
-    tickets = get_tickets()
+    tickets, _ = await asyncio.to_thread(read_indexed_tickets)
     
     # Create new ticket
     new_ticket = Ticket(
-        id=f"ticket_{len(tickets) + 1}",
+        id=f"ticket_{uuid.uuid4().hex}",
         title=request.title,
         description=request.description,
         category_id=request.category_id,
@@ -177,56 +257,60 @@ def create_ticket(request: TicketRequest, current_user: Dict[str, Any]) -> Ticke
     )
     
     tickets.append(new_ticket)
-    save_tickets(tickets)
     
-    # Search for relevant articles based on ticket title and description
+    # Search for relevant articles based on ticket title and description;
+    # the search doesn't depend on the save, so run both at once
     search_query = f"{request.title} {request.description}"
-    suggested_articles = search_kb_articles(search_query)
+    _, suggested_articles = await asyncio.gather(
+        asyncio.to_thread(save_tickets, tickets),
+        asyncio.to_thread(search_kb_articles, search_query)
+    )
     
     return TicketWithSuggestions(
         ticket=new_ticket,
         suggested_articles=suggested_articles
     )
 
-@router.get("/tickets")
-def list_tickets(current_user: Dict[str, Any], status: Optional[TicketStatus] = None) -> List[Ticket]:
+@router.get("/tickets", response_model=None, responses={200: {"model": List[Ticket]}})
+def list_tickets(current_user: Dict[str, Any], status: Optional[TicketStatus] = None) -> ORJSONResponse:
     """List all tickets or filter by status"""
     user_id = current_user['uid']
 
-    tickets = get_tickets()
+    tickets = get_user_tickets(user_id)
     
-    # Filter by user and status if provided
+    # Filter by status if provided
     filtered_tickets = [
-        ticket for ticket in tickets 
-        if ticket.user_id == user_id 
-        and (status is None or ticket.status == status)
+        ticket.model_dump(warnings=False) for ticket in tickets 
+        if status is None or ticket.status == status
     ]
     
-    return filtered_tickets
+    return ORJSONResponse(filtered_tickets)
 
-@router.get("/tickets/{ticket_id}")
-def get_ticket(ticket_id: str, current_user: Dict[str, Any]) -> Ticket:
+@router.get("/tickets/{ticket_id}", response_model=None, responses={200: {"model": Ticket}})
+def get_ticket(ticket_id: str, current_user: Dict[str, Any]) -> ORJSONResponse:
     """Get a specific ticket"""
     user_id = current_user['uid']
 
-    tickets = get_tickets()
-    ticket = next((t for t in tickets if t.id == ticket_id), None)
+    tickets, index = get_indexed_tickets()
+    ticket_index = index.get(ticket_id)
     
-    if not ticket:
+    if ticket_index is None:
         raise HTTPException(status_code=404, detail="Ticket not found")
     
+    ticket = tickets[ticket_index]
+    
     if ticket.user_id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to view this ticket")
     
-    return ticket
+    return ORJSONResponse(ticket.model_dump(warnings=False))
 
-@router.put("/tickets/{ticket_id}")
-def update_ticket(ticket_id: str, updates: Dict[str, Any], current_user: Dict[str, Any]) -> Ticket:
+@router.put("/tickets/{ticket_id}", response_model=None, responses={200: {"model": Ticket}})
+def update_ticket(ticket_id: str, updates: Dict[str, Any], current_user: Dict[str, Any]) -> ORJSONResponse:
     """Update a ticket"""
     user_id = current_user['uid']
 
-    tickets = get_tickets()
-    ticket_index = next((i for i, t in enumerate(tickets) if t.id == ticket_id), None)
+    tickets, index = read_indexed_tickets()
+    ticket_index = index.get(ticket_id)
     
     if ticket_index is None:
         raise HTTPException(status_code=404, detail="Ticket not found")
@@ -263,10 +347,10 @@ def update_ticket(ticket_id: str, updates: Dict[str, Any], current_user: Dict[st
     tickets[ticket_index] = ticket
     save_tickets(tickets)
     
-    return ticket
+    return ORJSONResponse(ticket.model_dump(warnings=False))
 
-@router.post("/tickets/{ticket_id}/attachments")
-def add_attachment(ticket_id: str, file: str, current_user: Dict[str, Any]) -> Ticket:
+@router.post("/tickets/{ticket_id}/attachments", response_model=None, responses={200: {"model": Ticket}})
+def add_attachment(ticket_id: str, file: str, current_user: Dict[str, Any]) -> ORJSONResponse:
     """Add an attachment to a ticket
     
     Args:
@@ -282,8 +366,8 @@ def add_attachment(ticket_id: str, file: str, current_user: Dict[str, Any]) -> T
     """
     user_id = current_user['uid']
 
-    tickets = get_tickets()
-    ticket_index = next((i for i, t in enumerate(tickets) if t.id == ticket_id), None)
+    tickets, index = read_indexed_tickets()
+    ticket_index = index.get(ticket_id)
     
     if ticket_index is None:
         raise HTTPException(status_code=404, detail="Ticket not found")
@@ -304,22 +388,25 @@ def add_attachment(ticket_id: str, file: str, current_user: Dict[str, Any]) -> T
         # Decode base64 file content
         import base64
         import mimetypes
-        from io import BytesIO
         
         # Split base64 string if it contains data URI scheme
         if ',' in file:
-            file = file.split(',')[1]
-        
-        file_data = base64.b64decode(file)
-        file_size = len(file_data)
+            file = file.split(',', 1)[1]
         
-        # Validate file size (5MB limit)
+        # Validate file size (5MB limit), rejecting oversized payloads from the
+        # encoded length before decoding them (base64 is 4 chars per 3 bytes,
+        # with up to 2 bytes of padding)
         MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB in bytes
+        too_large = f"File too large. Maximum size is {MAX_FILE_SIZE/1024/1024}MB"
+        if len(file) * 3 // 4 - 2 > MAX_FILE_SIZE:
+            raise ValueError(too_large)
+        
+        file_data = base64.b64decode(file, validate=True)
+        file_size = len(file_data)
         if file_size > MAX_FILE_SIZE:
-            raise ValueError(f"File too large. Maximum size is {MAX_FILE_SIZE/1024/1024}MB")
+            raise ValueError(too_large)
         
         # Detect content type
-        _ = BytesIO(file_data)  # Create buffer to validate file data
         content_type, _ = mimetypes.guess_type(attachment_id)
         if not content_type:
             content_type = "application/octet-stream"
@@ -346,7 +433,7 @@ def add_attachment(ticket_id: str, file: str, current_user: Dict[str, Any]) -> T
         tickets[ticket_index] = ticket
         save_tickets(tickets)
         
-        return ticket
+        return ORJSONResponse(ticket.model_dump(warnings=False))
     except ValueError as err:
         raise HTTPException(status_code=400, detail=str(err)) from err
     except Exception as err:
@@ -362,18 +449,29 @@ def get_kb_articles() -> List[KnowledgeBaseArticle]:
     """Get all knowledge base articles from storage"""
     try:
         articles = db.storage.json.get('kb_articles', default=[])
-        return [KnowledgeBaseArticle(**article) for article in articles]
+        # kb_articles is an internal storage key, so trust its records as stored
+        return [KnowledgeBaseArticle.model_construct(**article) for article in articles]
     except Exception as e:
         print(f"Error getting KB articles: {e}")
         return []
 
 def search_kb_articles(query: str) -> List[KnowledgeBaseArticle]:
     """Search knowledge base articles based on query"""
+    with _kb_search_cache_lock:
+        cached = _kb_search_cache.get(query)
+    if cached is not None:
+        return list(cached)
     try:
         # Call the knowledge base API's search endpoint
-        response = requests.get(f"{API_URL}/kb/search/{query}")
+        response = _kb_session.get(
+            f"{API_URL}/kb/search/{quote(query, safe='')}",
+            timeout=KB_SEARCH_TIMEOUT
+        )
         if response.status_code == 200:
-            return [KnowledgeBaseArticle(**article) for article in response.json()]
+            articles = [KnowledgeBaseArticle(**article) for article in response.json()]
+            with _kb_search_cache_lock:
+                _kb_search_cache[query] = articles
+            return list(articles)
         return []
     except Exception as e:
         print(f"Error searching KB articles: {e}")
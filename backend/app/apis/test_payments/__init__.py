@@ -1,11 +1,25 @@
+import uuid
 from datetime import datetime
 from typing import Optional, Dict, List, Tuple
 from enum import Enum
 from pydantic import BaseModel, Field
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
 import databutton as db
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Test card numbers mapped to their simulated (success, error) outcome
+TEST_CARD_BEHAVIORS: Dict[str, Tuple[bool, Optional[str]]] = {
+    "4242424242424242": (True, None),
+    "4000000000000002": (False, "Card declined"),
+    "4000000000009995": (False, "Insufficient funds"),
+    "4000000000000127": (False, "Stolen card"),
+    "4000000000000069": (False, "Expired card"),
+    "4000000000000119": (False, "Processing error"),
+}
+
+SUPPORTED_CURRENCIES = frozenset({"usd", "eur", "gbp"})
 
 class PaymentStatus(str, Enum):
     PENDING = "pending"
@@ -49,46 +63,23 @@ def get_test_payments() -> Dict[str, dict]:
     return db.storage.json.get('test_payments', default={})
 
 def save_test_payments(payments: Dict[str, dict]) -> None:
-    """Save test payments to storage"""
-    # Convert datetime to ISO format for storage
-    serializable_payments = {}
-    for payment_id, payment in payments.items():
-        payment_dict = payment.copy()
-        if isinstance(payment_dict['created_at'], datetime):
-            payment_dict['created_at'] = payment_dict['created_at'].isoformat()
-        serializable_payments[payment_id] = payment_dict
-    db.storage.json.put('test_payments', serializable_payments)
-
-def validate_test_card(card: TestCard) -> None:
-    """Validate test card details"""
-    valid_test_cards = {
-        "4242424242424242": "Always succeeds",
-        "4000000000000002": "Always declined",
-        "4000000000009995": "Insufficient funds decline",
-        "4000000000000127": "Stolen card decline",
-        "4000000000000069": "Expired card decline",
-        "4000000000000119": "Processing error decline",
-    }
+    """Save test payments to storage
     
-    if card.number not in valid_test_cards:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid test card number. Must be one of: {list(valid_test_cards.keys())}"
-        )
+    Records must already be JSON-ready, with created_at as an ISO string.
+    """
+    db.storage.json.put('test_payments', payments)
 
 def simulate_card_payment(card: TestCard, amount: float) -> Tuple[bool, Optional[str]]:
-    """Simulate card payment with different test cards and amounts"""
+    """Validate a test card and simulate its payment for the given amount"""
     # First check card behavior
-    card_behaviors = {
-        "4242424242424242": (True, None),
-        "4000000000000002": (False, "Card declined"),
-        "4000000000009995": (False, "Insufficient funds"),
-        "4000000000000127": (False, "Stolen card"),
-        "4000000000000069": (False, "Expired card"),
-        "4000000000000119": (False, "Processing error"),
-    }
+    behavior = TEST_CARD_BEHAVIORS.get(card.number)
+    if behavior is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid test card number. Must be one of: {list(TEST_CARD_BEHAVIORS)}"
+        )
     
-    success, error = card_behaviors.get(card.number, (False, "Invalid card number"))
+    success, error = behavior
     
     # Then check amount-specific rules
     if success:
@@ -99,8 +90,8 @@ def simulate_card_payment(card: TestCard, amount: float) -> Tuple[bool, Optional
     
     return success, error
 
-@router.post("/test-payments/create", response_model=TestPaymentResponse)
-def create_test_payment(request: CreateTestPaymentRequest):
+@router.post("/test-payments/create", response_model=None, responses={200: {"model": TestPaymentResponse}})
+def create_test_payment(request: CreateTestPaymentRequest) -> ORJSONResponse:
     """Create a test payment
     
     This endpoint simulates payment processing with different test cards and scenarios.
@@ -116,7 +107,7 @@ def create_test_payment(request: CreateTestPaymentRequest):
         
         # Validate currency
         request.currency = request.currency.lower()
-        if request.currency not in {"usd", "eur", "gbp"}:
+        if request.currency not in SUPPORTED_CURRENCIES:
             raise HTTPException(
                 status_code=400,
                 detail="Currency must be one of: usd, eur, gbp"
@@ -132,7 +123,6 @@ def create_test_payment(request: CreateTestPaymentRequest):
                     status_code=400,
                     detail="Card details required for card payment"
                 )
-            validate_test_card(request.card)
             success, error = simulate_card_payment(request.card, request.amount)
         
         elif request.payment_method == PaymentMethod.BANK_TRANSFER:
@@ -159,36 +149,26 @@ def create_test_payment(request: CreateTestPaymentRequest):
             else:
                 success, error = True, None
         
-        # Create payment record
-        payment = TestPaymentResponse(
-            payment_id=f"test_payment_{int(datetime.utcnow().timestamp())}",
-            amount=request.amount,
-            currency=request.currency,
-            status=PaymentStatus.SUCCEEDED if success else PaymentStatus.FAILED,
-            created_at=datetime.utcnow(),
-            payment_method=request.payment_method,
-            description=request.description,
-            metadata=request.metadata,
-            error=error
-        )
+        # Create payment record in its stored (JSON-ready) form; every field
+        # comes from the validated request, so it is also the response body
+        payment = {
+            'payment_id': f"test_payment_{uuid.uuid4().hex}",
+            'amount': request.amount,
+            'currency': request.currency,
+            'status': (PaymentStatus.SUCCEEDED if success else PaymentStatus.FAILED).value,
+            'created_at': datetime.utcnow().isoformat(),
+            'payment_method': request.payment_method.value,
+            'description': request.description,
+            'metadata': request.metadata,
+            'error': error
+        }
         
         # Store payment
         payments = get_test_payments()
-        payment_dict = {
-            'payment_id': payment.payment_id,
-            'amount': payment.amount,
-            'currency': payment.currency,
-            'status': payment.status,
-            'created_at': payment.created_at,
-            'payment_method': payment.payment_method,
-            'description': payment.description,
-            'metadata': payment.metadata,
-            'error': payment.error
-        }
-        payments[payment.payment_id] = payment_dict
+        payments[payment['payment_id']] = payment
         save_test_payments(payments)
         
-        return payment
+        return ORJSONResponse(payment)
         
     except HTTPException:
         raise
@@ -196,18 +176,16 @@ def create_test_payment(request: CreateTestPaymentRequest):
         print(f"[ERROR] Failed to create test payment: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e)) from e
 
-@router.get("/test-payments/{payment_id}", response_model=TestPaymentResponse)
-def get_test_payment(payment_id: str):
+@router.get("/test-payments/{payment_id}", response_model=None, responses={200: {"model": TestPaymentResponse}})
+def get_test_payment(payment_id: str) -> ORJSONResponse:
     """Get a specific test payment"""
     try:
         payments = get_test_payments()
         if payment_id not in payments:
             raise HTTPException(status_code=404, detail="Payment not found")
         
-        payment = payments[payment_id]
-        return TestPaymentResponse(
-            **{**payment, 'created_at': datetime.fromisoformat(payment['created_at'])}
-        )
+        # Stored records are already JSON-ready, created_at included
+        return ORJSONResponse(payments[payment_id])
         
     except HTTPException:
         raise
@@ -215,18 +193,12 @@ def get_test_payment(payment_id: str):
         print(f"[ERROR] Failed to get test payment: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e)) from e
 
-@router.get("/test-payments", response_model=List[TestPaymentResponse])
-def list_test_payments():
+@router.get("/test-payments", response_model=None, responses={200: {"model": List[TestPaymentResponse]}})
+def list_test_payments() -> ORJSONResponse:
     """List all test payments"""
     try:
         payments = get_test_payments()
-        # Convert stored dict back to TestPaymentResponse
-        return [
-            TestPaymentResponse(
-                **{**payment, 'created_at': datetime.fromisoformat(payment['created_at'])}
-            )
-            for payment in payments.values()
-        ]
+        return ORJSONResponse(list(payments.values()))
         
     except Exception as e:
         print(f"[ERROR] Failed to list test payments: {str(e)}")
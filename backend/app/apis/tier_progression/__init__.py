@@ -4,6 +4,7 @@ from fastapi import APIRouter, HTTPException
 import databutton as db
 from datetime import datetime, timedelta
 from enum import Enum
+from cachetools import TTLCache
 
 router = APIRouter()
 
@@ -68,17 +69,34 @@ DEFAULT_TIER_RULES = TierProgressionRules(
     grace_period=14      # 14 days to maintain requirements before demotion
 )
 
+# Parsed tier rules, shared read-only by requests on this worker;
+# save_tier_rules writes through
+TIER_RULES_CACHE_TTL = 60  # seconds
+_tier_rules_cache = TTLCache(maxsize=1, ttl=TIER_RULES_CACHE_TTL)
+
 def get_tier_rules() -> TierProgressionRules:
     """Get tier progression rules, either from storage or defaults"""
+    rules = _tier_rules_cache.get("rules")
+    if rules is not None:
+        return rules
     try:
         stored_rules = db.storage.json.get("tier_progression_rules")
-        return TierProgressionRules(**stored_rules)
-    except Exception:
+        rules = TierProgressionRules(**stored_rules)
+    except FileNotFoundError:
+        # No rules saved yet, so the defaults are the real rules
+        rules = DEFAULT_TIER_RULES
+    except Exception as e:
+        # Fall back for this request only; caching would hide the stored
+        # rules for a full TTL after a transient failure
+        print(f"[ERROR] Failed to load tier rules: {str(e)}")
         return DEFAULT_TIER_RULES
+    _tier_rules_cache["rules"] = rules
+    return rules
 
 def save_tier_rules(rules: TierProgressionRules):
     """Save tier progression rules to storage"""
     db.storage.json.put("tier_progression_rules", rules.dict())
+    _tier_rules_cache["rules"] = rules
 
 @router.get("/tier-requirements")
 def get_tier_requirements() -> List[TierRequirement]:
@@ -86,6 +104,65 @@ def get_tier_requirements() -> List[TierRequirement]:
     rules = get_tier_rules()
     return rules.tiers
 
+def compute_tier_status(rules: TierProgressionRules, metrics: dict) -> TierStatus:
+    """Work out a user's tier status from already-loaded rules and metrics"""
+    # Calculate current tier based on metrics
+    current_index = None
+    progress = {}
+    requirements_met = True
+    
+    # Calculate metrics
+    total_referrals = metrics.get("total_referrals", 0)
+    conversion_rate = metrics.get("conversion_rate", 0.0)
+    quality_score = metrics.get("quality_score", 0.0)
+    
+    # Track progress and requirements
+    for i, tier in enumerate(rules.tiers):
+        # Check if user meets this tier's requirements
+        meets_all = (
+            total_referrals >= tier.min_referrals
+            and conversion_rate >= tier.min_conversion_rate
+            and quality_score >= tier.min_quality_score
+        )
+        
+        # Calculate progress percentages
+        progress[tier.tier_name] = {
+            "referrals": min(100, (total_referrals / tier.min_referrals * 100) if tier.min_referrals > 0 else 100),
+            "conversion": min(100, (conversion_rate / tier.min_conversion_rate * 100) if tier.min_conversion_rate > 0 else 100),
+            "quality": min(100, (quality_score / tier.min_quality_score * 100) if tier.min_quality_score > 0 else 100)
+        }
+        
+        # If user meets all requirements, this is their current tier
+        if meets_all:
+            current_index = i
+        else:
+            requirements_met = False
+    
+    current_tier = rules.tiers[current_index].tier_name if current_index is not None else TierLevel.BRONZE
+    next_index = current_index + 1 if current_index is not None else 0
+    next_tier = None
+    missing_requirements = []
+    
+    # Only spell out what's missing for the tier the user is working towards
+    if current_index is not None and next_index < len(rules.tiers):
+        next_tier = rules.tiers[next_index].tier_name
+    if next_index < len(rules.tiers):
+        tier = rules.tiers[next_index]
+        if total_referrals < tier.min_referrals:
+            missing_requirements.append(f"Need {tier.min_referrals - total_referrals} more referrals for {tier.tier_name}")
+        if conversion_rate < tier.min_conversion_rate:
+            missing_requirements.append(f"Need {(tier.min_conversion_rate - conversion_rate) * 100:.1f}% higher conversion rate for {tier.tier_name}")
+        if quality_score < tier.min_quality_score:
+            missing_requirements.append(f"Need {tier.min_quality_score - quality_score:.1f} higher quality score for {tier.tier_name}")
+    
+    return TierStatus(
+        current_tier=current_tier,
+        next_tier=next_tier,
+        progress=progress,
+        requirements_met=requirements_met,
+        missing_requirements=missing_requirements
+    )
+
 @router.get("/tier-status/{user_id}")
 def get_tier_status(user_id: str) -> TierStatus:
     """Get current tier status and progression for a user"""
@@ -103,53 +180,7 @@ def get_tier_status(user_id: str) -> TierStatus:
                 "quality_score": 0.0
             }
         
-        # Calculate current tier based on metrics
-        current_tier = TierLevel.BRONZE  # Default tier
-        next_tier = None
-        progress = {}
-        missing_requirements = []
-        
-        # Calculate metrics
-        total_referrals = metrics.get("total_referrals", 0)
-        conversion_rate = metrics.get("conversion_rate", 0.0)
-        quality_score = metrics.get("quality_score", 0.0)
-        
-        # Track progress and requirements
-        for i, tier in enumerate(rules.tiers):
-            # Check if user meets this tier's requirements
-            meets_referrals = total_referrals >= tier.min_referrals
-            meets_conversion = conversion_rate >= tier.min_conversion_rate
-            meets_quality = quality_score >= tier.min_quality_score
-            
-            # Calculate progress percentages
-            progress[tier.tier_name] = {
-                "referrals": min(100, (total_referrals / tier.min_referrals * 100) if tier.min_referrals > 0 else 100),
-                "conversion": min(100, (conversion_rate / tier.min_conversion_rate * 100) if tier.min_conversion_rate > 0 else 100),
-                "quality": min(100, (quality_score / tier.min_quality_score * 100) if tier.min_quality_score > 0 else 100)
-            }
-            
-            # Track missing requirements
-            if not meets_referrals:
-                missing_requirements.append(f"Need {tier.min_referrals - total_referrals} more referrals for {tier.tier_name}")
-            if not meets_conversion:
-                missing_requirements.append(f"Need {(tier.min_conversion_rate - conversion_rate) * 100:.1f}% higher conversion rate for {tier.tier_name}")
-            if not meets_quality:
-                missing_requirements.append(f"Need {tier.min_quality_score - quality_score:.1f} higher quality score for {tier.tier_name}")
-            
-            # If user meets all requirements, this is their current tier
-            if meets_referrals and meets_conversion and meets_quality:
-                current_tier = tier.tier_name
-                # Set next tier if there is one
-                if i < len(rules.tiers) - 1:
-                    next_tier = rules.tiers[i + 1].tier_name
-        
-        return TierStatus(
-            current_tier=current_tier,
-            next_tier=next_tier,
-            progress=progress,
-            requirements_met=len(missing_requirements) == 0,
-            missing_requirements=missing_requirements
-        )
+        return compute_tier_status(rules, metrics)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calculating tier status: {str(e)}") from e
@@ -178,10 +209,10 @@ def calculate_tier(user_id: str) -> TierStatus:
             last_update = datetime.fromisoformat(last_update)
             if (datetime.utcnow() - last_update).days < rules.cooldown_period:
                 # Return current status without updating
-                return get_tier_status(user_id)
+                return compute_tier_status(rules, metrics)
         
-        # Calculate new tier
-        new_status = get_tier_status(user_id)
+        # Calculate new tier from the rules and metrics already loaded
+        new_status = compute_tier_status(rules, metrics)
         
         # Check if requirements are met for current tier
         if not new_status.requirements_met:
@@ -21,10 +21,12 @@ Typical usage:
     profile = get_profile(user_id, viewer_role)
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import typing
 import re
+import string
 from fastapi import APIRouter, HTTPException
 import databutton as db
 
@@ -39,9 +41,15 @@ from app.apis.models import (
 
 router = APIRouter(prefix="/utils", tags=["utils"])
 
+# Storage reads are I/O bound, so bulk profile fetches fan out over threads
+PROFILE_READ_WORKERS = 16
+_profile_read_pool = ThreadPoolExecutor(max_workers=PROFILE_READ_WORKERS)
+
 __all__ = [
     'store_profile',
     'get_profile',
+    'get_profiles_bulk',
+    'apply_privacy_filters',
     'update_profile',
     'calculate_profile_completeness',
     'get_profile_storage_key',
@@ -87,6 +95,13 @@ def get_storage_stats() -> Dict[str, int]:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
+_UNSAFE_KEY_CHARS = re.compile(r'[^a-zA-Z0-9._-]')
+_SAFE_KEY_BYTES = frozenset((string.ascii_letters + string.digits + '._-').encode('ascii'))
+# Byte table mapping every unsafe byte to '_' for the bytes.translate fast path
+_ASCII_KEY_TRANSLATION = bytes(
+    code if code in _SAFE_KEY_BYTES else ord('_') for code in range(256)
+)
+
 def sanitize_key(key: str) -> str:
     """
     Sanitize storage key to only allow alphanumeric and ._- symbols.
@@ -109,7 +124,10 @@ def sanitize_key(key: str) -> str:
         >>> sanitize_key("profiles/123")
         'profiles_123'
     """
-    return re.sub(r'[^a-zA-Z0-9._-]', '_', key)
+    # Keys are almost always ASCII, where a byte translation table beats the regex
+    if key.isascii():
+        return key.encode('ascii').translate(_ASCII_KEY_TRANSLATION).decode('ascii')
+    return _UNSAFE_KEY_CHARS.sub('_', key)
 
 def get_profile_storage_key(user_id: str) -> str:
     """
@@ -134,6 +152,34 @@ def get_profile_storage_key(user_id: str) -> str:
     """
     return sanitize_key(f"profiles.{user_id}")
 
+# Fields counted towards profile completeness, per user type
+REQUIRED_PROFILE_FIELDS: Dict[UserType, typing.Tuple[str, ...]] = {
+    UserType.FUND_MANAGER: (
+        "name", "company", "email", "fund_type", 
+        "fund_size", "investment_focus", "risk_profile",
+        "investment_strategy"
+    ),
+    UserType.LIMITED_PARTNER: (
+        "name", "company", "email", "investment_interests",
+        "typical_commitment_size", "risk_tolerance"
+    ),
+    UserType.CAPITAL_RAISER: (
+        "name", "company", "email", "deals_raised",
+        "industry_focus", "typical_deal_size"
+    )
+}
+
+OPTIONAL_PROFILE_FIELDS: typing.Tuple[str, ...] = (
+    "phone", "location", "bio", "linkedin_url", "website_url", 
+    "profile_image_url"
+)
+
+# Required plus optional fields per user type, checked in one pass
+_COMPLETENESS_FIELDS: Dict[UserType, typing.Tuple[str, ...]] = {
+    user_type: required + OPTIONAL_PROFILE_FIELDS
+    for user_type, required in REQUIRED_PROFILE_FIELDS.items()
+}
+
 def calculate_profile_completeness(profile: BaseProfile) -> float:
     """
     Calculate how complete a profile is based on filled fields.
@@ -156,43 +202,33 @@ def calculate_profile_completeness(profile: BaseProfile) -> float:
         >>> calculate_profile_completeness(profile)
         25.0  # Only 2 of 8 required fields filled
     """
-    required_fields = {
-        UserType.FUND_MANAGER: [
-            "name", "company", "email", "fund_type", 
-            "fund_size", "investment_focus", "risk_profile",
-            "investment_strategy"
-        ],
-        UserType.LIMITED_PARTNER: [
-            "name", "company", "email", "investment_interests",
-            "typical_commitment_size", "risk_tolerance"
-        ],
-        UserType.CAPITAL_RAISER: [
-            "name", "company", "email", "deals_raised",
-            "industry_focus", "typical_deal_size"
-        ]
-    }
-    
-    optional_fields = [
-        "phone", "location", "bio", "linkedin_url", "website_url", 
-        "profile_image_url"
-    ]
-    
-    # Get required fields for this profile type
-    required = required_fields[profile.user_type]
-    total_fields = len(required) + len(optional_fields)
-    filled_fields = 0
-    
-    # Check required fields
-    for field in required:
-        if hasattr(profile, field) and getattr(profile, field):
-            filled_fields += 1
-            
-    # Check optional fields
-    for field in optional_fields:
-        if hasattr(profile, field) and getattr(profile, field):
-            filled_fields += 1
-            
-    return (filled_fields / total_fields) * 100
+    # Get required and optional fields for this profile type
+    fields = _COMPLETENESS_FIELDS[profile.user_type]
+    
+    # Check required and optional fields; fields the model lacks count as empty.
+    # Pydantic keeps field values in the instance __dict__, and reading it
+    # directly avoids the AttributeError pydantic raises for undeclared names
+    values = profile.__dict__
+    filled_fields = sum(1 for field in fields if values.get(field))
+
+    return (filled_fields / len(fields)) * 100
+
+# Profile model used to validate each user type's profile data
+PROFILE_MODEL_BY_TYPE: Dict[UserType, typing.Type[BaseProfile]] = {
+    UserType.FUND_MANAGER: FundManagerProfile,
+    UserType.LIMITED_PARTNER: LimitedPartnerProfile,
+    UserType.CAPITAL_RAISER: CapitalRaiserProfile
+}
+
+# Privacy settings given to every new profile, validated once at import
+DEFAULT_PRIVACY_SETTINGS: Dict = ProfileVisibility(
+    show_in_search=True,
+    show_to_roles=[UserType.FUND_MANAGER.value, UserType.LIMITED_PARTNER.value, UserType.CAPITAL_RAISER.value],
+    show_contact_info=True,
+    show_fund_details=True,
+    show_investment_history=True,
+    show_analytics=True
+).dict()
 
 def store_profile(profile_data: Dict, user_id: str) -> Dict:
     """
@@ -237,27 +273,20 @@ def store_profile(profile_data: Dict, user_id: str) -> Dict:
         profile_data['created_at'] = now
         profile_data['updated_at'] = now
         
-        # Set default privacy settings
-        profile_data['privacy_settings'] = ProfileVisibility(
-            show_in_search=True,
-            show_to_roles=[UserType.FUND_MANAGER.value, UserType.LIMITED_PARTNER.value, UserType.CAPITAL_RAISER.value],
-            show_contact_info=True,
-            show_fund_details=True,
-            show_investment_history=True,
-            show_analytics=True
-        ).dict()
+        # Set default privacy settings, copying the roles list so profiles
+        # never share it with the template
+        profile_data['privacy_settings'] = {
+            **DEFAULT_PRIVACY_SETTINGS,
+            "show_to_roles": list(DEFAULT_PRIVACY_SETTINGS["show_to_roles"])
+        }
         
         # Validate profile based on role
         try:
             user_type = profile_data.get('user_type')
-            if user_type == UserType.FUND_MANAGER:
-                validated_profile = FundManagerProfile(**profile_data)
-            elif user_type == UserType.LIMITED_PARTNER:
-                validated_profile = LimitedPartnerProfile(**profile_data)
-            elif user_type == UserType.CAPITAL_RAISER:
-                validated_profile = CapitalRaiserProfile(**profile_data)
-            else:
+            profile_model = PROFILE_MODEL_BY_TYPE.get(user_type)
+            if profile_model is None:
                 raise HTTPException(status_code=400, detail=f"Invalid user_type: {user_type}")
+            validated_profile = profile_model(**profile_data)
         except Exception as e:
             print(f"[DEBUG] Profile validation error: {str(e)}")
             print(f"[DEBUG] Profile data: {profile_data}")
@@ -283,6 +312,38 @@ def store_profile(profile_data: Dict, user_id: str) -> Dict:
             raise
         raise HTTPException(status_code=500, detail=str(err)) from err
 
+def apply_privacy_filters(profile_data: Dict, viewer_role: Optional[UserType] = None) -> Dict:
+    """
+    Filter stored profile data down to what a viewer may see.
+    
+    Viewers whose role is not in the profile's show_to_roles get only the
+    essential identity fields; otherwise contact details are dropped when
+    the profile hides them.
+    
+    Args:
+        profile_data: Profile data as stored, modified in place
+        viewer_role: Role of the viewing user for permission check
+    
+    Returns:
+        Dict containing filtered profile data based on permissions
+    """
+    # Apply privacy filters based on viewer role
+    if viewer_role and viewer_role.value not in profile_data["privacy_settings"]["show_to_roles"]:
+        # Return limited profile data
+        return {
+            "user_id": profile_data["user_id"],
+            "role": profile_data["role"],
+            "name": profile_data["name"],
+            "company": profile_data["company"]
+        }
+    
+    # Remove sensitive fields if contact info is hidden
+    if not profile_data["privacy_settings"]["show_contact_info"]:
+        profile_data.pop("email", None)
+        profile_data.pop("phone", None)
+    
+    return profile_data
+
 def get_profile(user_id: str, viewer_role: Optional[UserType] = None) -> Dict:
     """
     Get a profile from storage with privacy filtering.
@@ -323,22 +384,7 @@ def get_profile(user_id: str, viewer_role: Optional[UserType] = None) -> Dict:
                 detail="Profile not found"
             ) from e
         
-        # Apply privacy filters based on viewer role
-        if viewer_role and viewer_role.value not in profile_data["privacy_settings"]["show_to_roles"]:
-            # Return limited profile data
-            return {
-                "user_id": profile_data["user_id"],
-                "role": profile_data["role"],
-                "name": profile_data["name"],
-                "company": profile_data["company"]
-            }
-        
-        # Remove sensitive fields if contact info is hidden
-        if not profile_data["privacy_settings"]["show_contact_info"]:
-            profile_data.pop("email", None)
-            profile_data.pop("phone", None)
-        
-        return profile_data
+        return apply_privacy_filters(profile_data, viewer_role)
     
     except Exception as err:
         print(f"[ERROR] Failed to get profile for user {user_id}: {str(err)}")
@@ -346,6 +392,40 @@ def get_profile(user_id: str, viewer_role: Optional[UserType] = None) -> Dict:
             raise
         raise HTTPException(status_code=500, detail=str(err)) from err
 
+def get_profiles_bulk(user_ids: List[str], viewer_role: Optional[UserType] = None) -> Dict[str, Dict]:
+    """
+    Get several profiles from storage at once with privacy filtering.
+    
+    Storage reads run concurrently on a shared thread pool, so fetching N
+    profiles costs about one storage round-trip instead of N.
+    
+    Args:
+        user_ids: IDs of the users whose profiles to retrieve
+        viewer_role: Role of the viewing user for permission check
+    
+    Returns:
+        Dict mapping each user ID that has a stored profile to its filtered
+        profile data; users without a profile are left out
+    
+    Raises:
+        HTTPException:
+        - 500: Storage operation failed
+    """
+    try:
+        storage_keys = [get_profile_storage_key(user_id) for user_id in user_ids]
+        profiles = _profile_read_pool.map(
+            lambda key: db.storage.json.get(key, default=None), storage_keys
+        )
+        return {
+            user_id: apply_privacy_filters(profile_data, viewer_role)
+            for user_id, profile_data in zip(user_ids, profiles)
+            if profile_data is not None
+        }
+    
+    except Exception as err:
+        print(f"[ERROR] Failed to get profiles for {len(user_ids)} users: {str(err)}")
+        raise HTTPException(status_code=500, detail=str(err)) from err
+
 def update_profile(user_id: str, updates: Dict) -> Dict:
     """
     Update a profile in storage with validation.
@@ -386,27 +466,26 @@ def update_profile(user_id: str, updates: Dict) -> Dict:
     """
     try:
         storage_key = get_profile_storage_key(user_id)
-        if not db.storage.json.exists(storage_key):
+        
+        # Get current profile
+        try:
+            profile_data = db.storage.json.get(storage_key)
+        except FileNotFoundError as e:
             raise HTTPException(
                 status_code=404,
                 detail="Profile not found"
-            )
-        
-        # Get current profile
-        profile_data = db.storage.json.get(storage_key)
+            ) from e
         
         # Update fields
         profile_data.update(updates)
         profile_data["updated_at"] = datetime.utcnow().isoformat()
         
         # Recalculate completeness
-        profile_type = profile_data["user_type"]
-        if profile_type == UserType.FUND_MANAGER:
-            profile = FundManagerProfile(**profile_data)
-        elif profile_type == UserType.LIMITED_PARTNER:
-            profile = LimitedPartnerProfile(**profile_data)
-        else:
-            profile = CapitalRaiserProfile(**profile_data)
+        profile_type = profile_data.get("user_type")
+        profile_model = PROFILE_MODEL_BY_TYPE.get(profile_type)
+        if profile_model is None:
+            raise HTTPException(status_code=400, detail=f"Invalid user_type: {profile_type}")
+        profile = profile_model(**profile_data)
         
         completeness = calculate_profile_completeness(profile)
         profile_data["completeness"] = completeness